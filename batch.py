@@ -0,0 +1,97 @@
+"""Run many non-interactive episodes across worker processes.
+
+A job is one level played with one input: a ScriptedInput file, or a seed
+for a random (right-biased) script. Workers run headless (dummy SDL drivers,
+no frame limiter) and stay up between jobs, so images, parsed levels and
+parsed scripts are loaded once per process. Results stream back as they
+finish, in completion order:
+
+    for result in batch.run_jobs(batch.make_jobs(range(1, 12), seeds=range(1000))):
+        ...
+
+Each result is the job's fields plus GameState.simulate's summary, with
+'outcome' one of 'exit', 'died' or 'timeout' and 'death_cause' 'enemy' or
+'lava' for deaths.
+"""
+import os
+import random
+import multiprocessing
+from collections import namedtuple
+
+import main
+
+Job = namedtuple('Job', 'level script seed max_frames', defaults=(None, None, 3600))
+
+# per process: the GameState every job is played on, and the parsed scripts
+_state = None
+_scripts = {}
+
+
+def make_jobs(levels, scripts=(), seeds=(), max_frames=3600):
+    """Every level against every script path and every seed."""
+    jobs = []
+    for level in levels:
+        jobs.extend(Job(level, script, None, max_frames) for script in scripts)
+        jobs.extend(Job(level, None, seed, max_frames) for seed in seeds)
+    return jobs
+
+
+def random_script(seed, steps=200):
+    """A reproducible random input script, mostly running right and jumping."""
+    rnd = random.Random(seed)
+    choices = [{'d'}, {'d', 'space'}, {'d'}, {'a'}, set(), {'space'}]
+    return main.ScriptedInput([(rnd.randint(3, 30), rnd.choice(choices)) for _ in range(steps)])
+
+
+def _init_worker():
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    os.environ['SDL_AUDIODRIVER'] = 'dummy'
+    # warm up: the level grids and sprite images are then ready for every job
+    for level in range(1, main.max_levels + 1):
+        main.grid_cache.get(level)
+    _get_state().reset_level(1)
+
+
+def _get_state():
+    global _state
+    if _state is None:
+        _state = main.GameState(None, headless=True)
+    return _state
+
+
+def _inputs(job):
+    if job.script is None:
+        return random_script(job.seed)
+    inputs = _scripts.get(job.script)
+    if inputs is None:
+        inputs = _scripts[job.script] = main.ScriptedInput.load(job.script)
+    inputs.rewind()
+    return inputs
+
+
+def run_job(job):
+    """Play `job` in this process; returns its result dict."""
+    state = _get_state()
+    if state.world is not None and state.level == job.level:
+        state.restart_level()
+    else:
+        state.reset_level(job.level)
+        state.score = 0
+    result = state.simulate(job.max_frames, _inputs(job), advance=False)
+    result.update(job._asdict())
+    result['outcome'] = {1: 'exit', -1: 'died'}.get(result['game_over'], 'timeout')
+    return result
+
+
+def run_jobs(jobs, processes=None, chunksize=16):
+    """Yield each job's result as it completes, using `processes` workers (default: all cores)."""
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        for job in jobs:
+            yield run_job(job)
+        return
+    # spawn, not fork: a forked worker can inherit locks held by the level
+    # prefetch threads and the SDL state of the parent
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes, initializer=_init_worker) as pool:
+        yield from pool.imap_unordered(run_job, jobs, chunksize)
@@ -0,0 +1,265 @@
+"""
+Headless benchmark suite: level loading, World construction, the per-tick
+group updates and Player.update collision, a whole logic tick, and a full
+rendered frame, on the shipped levels and on generated levels from 20x20 up
+to 500x500 packed with enemies, platforms and coins.
+Results (median ms per operation) go to a JSON file and are compared with a
+stored baseline; the run fails if any result is more than --threshold slower.
+Usage:
+    python benchmarks/suite.py [--quick] [--rounds N] [--out FILE] [--baseline FILE]
+                                          [--threshold 0.25] [--min-delta 0.02] [--update-baseline]
+Baselines are machine specific: refresh one with --update-baseline on the
+machine that checks against it.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+import pygame  # noqa: E402
+import main  # noqa: E402
+import utils  # noqa: E402
+import batch  # noqa: E402
+import profiler  # noqa: E402
+
+BASELINE = os.path.join(HERE, 'baseline.json')
+RESULTS = os.path.join(HERE, 'results.json')
+
+SIZES = (20, 50, 100, 200, 500)
+QUICK_SIZES = (20, 100)
+SYNTHETIC_LEVEL = 1000    # synthetic level N x N is saved as level (1000 + N)
+
+
+def synthetic_level(size, seed=0):
+    """A size x size level: walled, with a grass floor every 4 rows and dense
+    enemies, coins, lava and moving platforms on the floors; exit bottom right."""
+    rnd = random.Random(seed)
+    rows = [[0] * size for _ in range(size)]
+    for row in rows:
+        row[0] = row[-1] = 1
+    rows[-1] = [1] * size
+    for floor in [size - 1] + list(range(size - 5, 0, -4)):
+        for col in range(1, size - 1):
+            if floor != size - 1 and rnd.random() < 0.15:
+                continue  # gap to drop through
+            if floor != size - 1:
+                rows[floor][col] = 2
+            if col < 5 and floor == size - 1:
+                continue  # keep the spawn point clear
+            roll = rnd.random()
+            if roll < 0.15:
+                rows[floor - 1][col] = 3
+            elif roll < 0.45:
+                rows[floor - 1][col] = 7
+            elif roll < 0.5:
+                rows[floor][col] = 6
+            elif roll < 0.55 and floor > 2:
+                rows[floor - 2][col] = rnd.choice((4, 5))
+    rows[-2][-2] = 8
+    return rows
+
+
+@contextlib.contextmanager
+def synthetic_levels(sizes):
+    """Write the synthetic levels (JSON and .lvl) to a temporary level directory;
+    yields {size: level number}."""
+    tmp = tempfile.mkdtemp(prefix='cartofia-bench-')
+    levels_dir = utils.LEVELS_DIR
+    numbers = {}
+    try:
+        for size in sizes:
+            number = numbers[size] = SYNTHETIC_LEVEL + size
+            rows = synthetic_level(size)
+            with open(os.path.join(tmp, f'level{number}.json'), 'w', encoding='utf-8') as f:
+                json.dump(rows, f)
+            utils.save_level_binary(os.path.join(tmp, f'level{number}.lvl'), rows)
+        utils.LEVELS_DIR = tmp
+        yield numbers
+    finally:
+        utils.LEVELS_DIR = levels_dir
+        for number in numbers.values():
+            main.grid_cache.evict(number)
+            main.level_cache.evict(number)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def median_ms(fn, repeat, min_seconds=0.2):
+    """Median ms of `fn()`, over at least `repeat` calls and about `min_seconds`."""
+    times = []
+    deadline = time.perf_counter() + min_seconds
+    while len(times) < repeat or (time.perf_counter() < deadline and len(times) < 100 * repeat):
+        start = time.perf_counter_ns()
+        fn()
+        times.append(time.perf_counter_ns() - start)
+    return statistics.median(times) / 1e6
+
+
+def calibrate():
+    """ms for a fixed pure-Python workload: how fast this machine is right now."""
+    def work():
+        total = 0
+        for i in range(200000):
+            total += i % 7
+        return total
+    return median_ms(work, 5)
+
+
+def build_state(grid):
+    state = main.GameState(None, headless=True)
+    state.world = main.World(grid, state=state)
+    return state
+
+
+def bench_ticks(grid, ticks):
+    """p50 ms of the patrol updates, Player.update and the whole tick, from the
+    frame profiler over `ticks` ticks of random right-biased input."""
+    state = build_state(grid)
+    prof = state.profiler = profiler.FrameProfiler(size=ticks)
+    inputs = batch.random_script(0)
+    for _ in range(ticks):
+        keys = inputs.next()
+        prof.mark()
+        state.tick(keys)
+        prof.end_frame()
+        if state.game_over:
+            state.restart_level()
+    stats = prof.stats()
+    return {'groups': stats['patrols']['p50'], 'player': stats['player']['p50'],
+            'tick': stats['frame']['p50']}
+
+
+def bench_frames(level, frames):
+    """p50 ms of a full Game.step (one tick, draw, present) on `level`."""
+    game = main.Game(level=level, main_menu=False, profile=True)
+    game.step()  # first frame: level layer and text caches
+    game.set_profiling(True)
+    for _ in range(frames):
+        game.profiler.mark()
+        game.step()
+    return game.profile_stats()['frame']['p50']
+
+
+def bench_level(level, quick=False):
+    grid = utils.load_level(level)
+    repeat = 3 if quick else 5
+    result = {
+        'load_json': median_ms(lambda: utils.load_level_data(level), repeat),
+        'load_lvl': median_ms(lambda: utils.load_level(level).tiles.tobytes(), repeat),
+        'world': median_ms(lambda: build_state(grid), repeat),
+    }
+    result.update(bench_ticks(grid, 60 if quick else 300))
+    result['frame'] = bench_frames(level, 30 if quick else 200)
+    return result
+
+
+def run(quick=False, sizes=None, levels=None, rounds=None, log=print):
+    """Run the suite `rounds` times, keeping each result's fastest round (the
+    least disturbed by the rest of the machine); returns
+    {'meta': ..., 'results': {'<level>/<metric>': ms}}."""
+    if sizes is None:
+        sizes = QUICK_SIZES if quick else SIZES
+    if levels is None:
+        levels = range(1, main.max_levels + 1)
+    if rounds is None:
+        rounds = 1 if quick else 3
+    results = {}
+
+    def record(name, metrics):
+        for metric, ms in metrics.items():
+            key = f'{name}/{metric}'
+            results[key] = round(min(ms, results.get(key, ms)), 4)
+        log(f'{name:>12} ' + ' '.join(f'{metric}={ms:.3f}' for metric, ms in metrics.items()))
+
+    calibration = []
+    for round_ in range(rounds):
+        calibration.append(calibrate())
+        if rounds > 1:
+            log(f'round {round_ + 1} of {rounds}')
+        for level in levels:
+            record(f'level{level}', bench_level(level, quick))
+        with synthetic_levels(sizes) as numbers:
+            for size, number in numbers.items():
+                record(f'gen{size}x{size}', bench_level(number, quick))
+        calibration.append(calibrate())
+    meta = {'python': platform.python_version(), 'pygame': pygame.version.ver,
+            'machine': platform.machine(), 'quick': quick, 'rounds': rounds}
+    return {'meta': meta, 'calibration': round(min(calibration), 4), 'results': results}
+
+
+def compare(results, baseline, threshold, min_delta=0.02):
+    """(name, baseline ms, ms, ratio) for each result more than `threshold`
+    (a fraction) and more than `min_delta` ms slower than the baseline, so
+    microsecond jitter doesn't count; names missing from either are skipped.
+
+    Baseline times are first scaled by the two runs' calibration times, so a
+    machine that is busier (or throttled) than when the baseline was taken
+    doesn't flag everything.
+    """
+    scale = 1.0
+    if results.get('calibration') and baseline.get('calibration'):
+        scale = results['calibration'] / baseline['calibration']
+    regressions = []
+    for name, base in baseline['results'].items():
+        ms = results['results'].get(name)
+        if ms is None or base <= 0:
+            continue
+        base *= scale
+        ratio = ms / base
+        if ratio > 1 + threshold and ms - base > min_delta:
+            regressions.append((name, base, ms, ratio))
+    return regressions
+
+
+def save(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+        f.write('\n')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help='fewer sizes and samples')
+    parser.add_argument('--rounds', type=int, help='runs of the suite to take the fastest of (default 3, 1 with --quick)')
+    parser.add_argument('--out', default=RESULTS)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed slowdown as a fraction (default 0.25 = 25%%)')
+    parser.add_argument('--min-delta', type=float, default=0.02,
+                        help='ignore slowdowns smaller than this many ms (default 0.02)')
+    parser.add_argument('--update-baseline', action='store_true', help='write the results as the new baseline')
+    args = parser.parse_args()
+
+    data = run(args.quick, rounds=args.rounds)
+    save(args.out, data)
+    print(f'results written to {args.out}')
+    if args.update_baseline:
+        save(args.baseline, data)
+        print(f'baseline updated: {args.baseline}')
+        sys.exit(0)
+    if not os.path.exists(args.baseline):
+        print(f'no baseline at {args.baseline}; run with --update-baseline to create one')
+        sys.exit(0)
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline['meta'] != data['meta']:
+        print(f"warning: baseline from {baseline['meta']}, this run {data['meta']}")
+    print(f"calibration {baseline.get('calibration')} ms then, {data['calibration']} ms now")
+    regressions = compare(data, baseline, args.threshold, args.min_delta)
+    for name, base, ms, ratio in regressions:
+        print(f'REGRESSION {name}: {base:.3f} -> {ms:.3f} ms ({ratio:.2f}x)')
+    print(f'{len(regressions)} of {len(baseline["results"])} results over the {args.threshold:.0%} threshold')
+    sys.exit(1 if regressions else 0)
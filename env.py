@@ -0,0 +1,203 @@
+"""Step API for bots and automated playtesting.
+
+    env = Env()
+    obs = env.reset(3)
+    obs, reward, done = env.step(RIGHT | JUMP)
+
+Actions are bitmasks of JUMP, LEFT and RIGHT. The physics is GameState.tick
+(Player, Enemy and Platform update); nothing is drawn and no display is
+opened. Observations are NumPy arrays updated in place every step, so copy
+them to keep a history:
+
+    obs['tiles']     uint8 (rows, cols)          level grid (tile codes, as in levelN.json)
+    obs['player']    int32 (5,)                  x, y, vel_y, in_air, score
+    obs['entities']  int32 (entities, 4)         kind (tile code), x, y, alive
+
+Entity rows are the enemies, platforms, lava, coins (the HUD coin first) and
+exits in build order, one per entity in the level; BatchEnv pads every env to
+its densest level with rows of zeros. An episode is one level: it
+is done when the player dies or reaches the exit. BatchEnv steps N
+environments per call over shared (N, ...) arrays. numpy_patrols=True (or
+CARTOFIA_NUMPY_PATROLS=1) steps the enemies and platforms as arrays
+(patrols.PatrolArrays), which pays off with many of them.
+
+Needs NumPy, which the game itself does not.
+"""
+import numpy as np
+
+import main
+
+JUMP = main.KEY_JUMP
+LEFT = main.KEY_LEFT
+RIGHT = main.KEY_RIGHT
+# key state for every action bitmask, in the shape Player.update reads
+ACTION_KEYS = main.MASK_KEYS
+
+REWARD_COIN = 1.0    # per point scored
+REWARD_EXIT = 10.0
+REWARD_DEATH = -10.0
+
+ENTITY_TILES = (3, 4, 5, 6, 7, 8)  # the tile codes World builds a sprite for
+
+
+def _grid(level):
+    grid, _ = main.grid_cache.get(level)
+    if grid is None:
+        return np.zeros((20, 20), np.uint8)  # GameState falls back to an empty 20x20 level
+    if isinstance(grid, list):
+        return np.array(grid, np.uint8)
+    # a view of the (possibly memory-mapped) level buffer, not a copy
+    return np.frombuffer(grid.tiles, np.uint8).reshape(grid.height, grid.width)
+
+
+def _entity_count(level):
+    """Entity rows `level` needs: one per sprite tile, plus the HUD coin."""
+    return int(np.isin(_grid(level), ENTITY_TILES).sum()) + 1
+
+
+class Env:
+    """One game as an environment. `out` holds arrays to write observations into
+    (BatchEnv passes its per-env slices); by default the Env allocates its own."""
+
+    def __init__(self, out=None, numpy_patrols=None):
+        self.state = main.GameState(None, headless=True, numpy_patrols=numpy_patrols)
+        if out is None:
+            out = {'tiles': None, 'player': np.zeros(5, np.int32), 'entities': None}
+        self.obs = out
+        # None: sized to each level as it is loaded
+        self._tiles_out = out['tiles']
+        self._entities_out = out['entities']
+        self._coin_rows = {}
+        self.done = True
+
+    def reset(self, level=None):
+        """Start an episode on `level` (default: the current one); returns the observation."""
+        state = self.state
+        if level is None:
+            level = state.level or 1
+        if state.world is not None and level == state.level:
+            state.restart_level()  # same level: reuse the built World
+        else:
+            state.reset_level(level)
+            self._load_level(level)
+        state.score = 0  # reset_level carries the score on to the next level
+        self._fill_entities()
+        self._score = 0
+        self.done = False
+        self._write_player()
+        return self.obs
+
+    def _load_level(self, level):
+        tiles = _grid(level)
+        if self._tiles_out is None:
+            self.obs['tiles'] = tiles
+        else:
+            self._tiles_out[...] = 0
+            self._tiles_out[:tiles.shape[0], :tiles.shape[1]] = tiles
+        state = self.state
+        world = state.world
+        rows = []
+        for sprite in world.patrols:
+            if sprite in state.platform_group:
+                rows.append((5 if sprite.move_y else 4, sprite))
+            else:
+                rows.append((3, sprite))
+        rows.extend((6, sprite) for sprite in state.lava_group)
+        rows.extend((7, sprite) for sprite in world.coins)
+        rows.extend((8, sprite) for sprite in state.exit_group)
+        if self._entities_out is None:
+            self.obs['entities'] = np.zeros((len(rows), 4), np.int32)
+        elif len(rows) > len(self._entities_out):
+            raise ValueError(f'level {level} has {len(rows)} entities, '
+                             f'more than the {len(self._entities_out)} rows to write them to')
+        self._rows = rows
+        self._patrols = world.patrols
+        self._coin_rows = {sprite: i for i, (kind, sprite) in enumerate(rows) if kind == 7}
+
+    def _fill_entities(self):
+        entities = self.obs['entities']
+        entities[...] = 0
+        for i, (kind, sprite) in enumerate(self._rows):
+            entities[i] = (kind, sprite.rect.x, sprite.rect.y, 1)
+
+    def _write_player(self):
+        state = self.state
+        player = state.player
+        self.obs['player'][:] = (player.rect.x, player.rect.y, player.vel_y, player.in_air, state.score)
+
+    def step(self, action):
+        """Apply `action` for one tick; returns (observation, reward, done)."""
+        if self.done:
+            raise RuntimeError('episode is over, call reset()')
+        state = self.state
+        collected = state.tick(ACTION_KEYS[action])
+        world = state.world
+        if world.vectorized:
+            # read the arrays directly instead of syncing every sprite
+            entities = self.obs['entities']
+            blobs = len(world.blob_hash)
+            entities[:blobs, 1] = world.blob_hash.x
+            entities[:blobs, 2] = world.blob_hash.y
+            entities[blobs:len(self._patrols), 1] = world.platform_hash.x
+            entities[blobs:len(self._patrols), 2] = world.platform_hash.y
+        elif self._patrols:
+            self.obs['entities'][:len(self._patrols), 1:3] = [sprite.rect.topleft for sprite in self._patrols]
+        for coin in collected:
+            self.obs['entities'][self._coin_rows[coin], 3] = 0
+        self._write_player()
+
+        reward = (state.score - self._score) * REWARD_COIN
+        self._score = state.score
+        if state.game_over == 1:
+            reward += REWARD_EXIT
+        elif state.game_over == -1:
+            reward += REWARD_DEATH
+        self.done = state.game_over != 0
+        return self.obs, reward, self.done
+
+
+class BatchEnv:
+    """N environments stepped by one call. `levels` is one level for all or one per env.
+
+    Observations, rewards and dones are (N, ...) arrays updated in place; a
+    finished env is reset to its level straight away, so its row already
+    holds the next episode's first observation (the reward and done flag are
+    the finished episode's last).
+    """
+
+    def __init__(self, n, levels=1, numpy_patrols=None):
+        if isinstance(levels, int):
+            levels = [levels] * n
+        if len(levels) != n:
+            raise ValueError(f'expected {n} levels, got {len(levels)}')
+        self.levels = list(levels)
+        shapes = [_grid(level).shape for level in set(self.levels)]
+        rows = max(shape[0] for shape in shapes)
+        cols = max(shape[1] for shape in shapes)
+        entities = max(_entity_count(level) for level in set(self.levels))
+        self.obs = {'tiles': np.zeros((n, rows, cols), np.uint8),
+                    'player': np.zeros((n, 5), np.int32),
+                    'entities': np.zeros((n, entities, 4), np.int32)}
+        self.rewards = np.zeros(n, np.float32)
+        self.dones = np.zeros(n, np.bool_)
+        self.envs = [Env({key: array[i] for key, array in self.obs.items()}, numpy_patrols) for i in range(n)]
+
+    def __len__(self):
+        return len(self.envs)
+
+    def reset(self):
+        for env, level in zip(self.envs, self.levels):
+            env.reset(level)
+        return self.obs
+
+    def step(self, actions):
+        """Apply one action per env; returns (observations, rewards, dones)."""
+        rewards = self.rewards
+        dones = self.dones
+        for i, env in enumerate(self.envs):
+            _, reward, done = env.step(actions[i])
+            rewards[i] = reward
+            dones[i] = done
+            if done:
+                env.reset(self.levels[i])
+        return self.obs, rewards, dones
@@ -1,8 +1,6 @@
 import os
 import json
 import pygame
-import pickle
-from os import path
 import utils
 
 
@@ -74,42 +72,56 @@ def draw_grid():
 		pygame.draw.line(screen, white, (0, c * tile_size), (screen_width, c * tile_size))
 
 
+#tiles are composed into world_layer and only redrawn when the level changes
+world_layer = None
+
+def build_world_layer():
+	layer = pygame.Surface((screen_width, screen_height - margin), pygame.SRCALPHA)
+	render_world(layer)
+	return layer
+
 def draw_world():
+	global world_layer
+	if world_layer is None:
+		world_layer = build_world_layer()
+	screen.blit(world_layer, (0, 0))
+
+def render_world(surface):
 	for row in range(20):
 		for col in range(20):
 			if world_data[row][col] > 0:
 				if world_data[row][col] == 1:
 					#dirt blocks
 					img = pygame.transform.scale(dirt_img, (tile_size, tile_size))
-					screen.blit(img, (col * tile_size, row * tile_size))
+					surface.blit(img, (col * tile_size, row * tile_size))
 				if world_data[row][col] == 2:
 					#grass blocks
 					img = pygame.transform.scale(grass_img, (tile_size, tile_size))
-					screen.blit(img, (col * tile_size, row * tile_size))
+					surface.blit(img, (col * tile_size, row * tile_size))
 				if world_data[row][col] == 3:
 					#enemy blocks
 					img = pygame.transform.scale(blob_img, (tile_size, int(tile_size * 0.75)))
-					screen.blit(img, (col * tile_size, row * tile_size + (tile_size * 0.25)))
+					surface.blit(img, (col * tile_size, row * tile_size + (tile_size * 0.25)))
 				if world_data[row][col] == 4:
 					#horizontally moving platform
 					img = pygame.transform.scale(platform_x_img, (tile_size, tile_size // 2))
-					screen.blit(img, (col * tile_size, row * tile_size))
+					surface.blit(img, (col * tile_size, row * tile_size))
 				if world_data[row][col] == 5:
 					#vertically moving platform
 					img = pygame.transform.scale(platform_y_img, (tile_size, tile_size // 2))
-					screen.blit(img, (col * tile_size, row * tile_size))
+					surface.blit(img, (col * tile_size, row * tile_size))
 				if world_data[row][col] == 6:
 					#lava
 					img = pygame.transform.scale(lava_img, (tile_size, tile_size // 2))
-					screen.blit(img, (col * tile_size, row * tile_size + (tile_size // 2)))
+					surface.blit(img, (col * tile_size, row * tile_size + (tile_size // 2)))
 				if world_data[row][col] == 7:
 					#coin
 					img = pygame.transform.scale(coin_img, (tile_size // 2, tile_size // 2))
-					screen.blit(img, (col * tile_size + (tile_size // 4), row * tile_size + (tile_size // 4)))
+					surface.blit(img, (col * tile_size + (tile_size // 4), row * tile_size + (tile_size // 4)))
 				if world_data[row][col] == 8:
 					#exit
 					img = pygame.transform.scale(exit_img, (tile_size, int(tile_size * 1.5)))
-					screen.blit(img, (col * tile_size, row * tile_size - (tile_size // 2)))
+					surface.blit(img, (col * tile_size, row * tile_size - (tile_size // 2)))
 
 
 
@@ -157,19 +169,17 @@ while run:
 
 	#load and save level
 	if save_button.draw():
-		# save level data as JSON (better cross-platform/web compatibility)
+		# save level data as binary .lvl (what the game loads) and JSON (readable, web fallback)
+		utils.save_level_binary(os.path.join(utils.LEVELS_DIR, f'level{level}.lvl'), world_data)
 		json_path = os.path.join(os.path.dirname(__file__), f'level{level}.json')
 		with open(json_path, 'w', encoding='utf-8') as pickle_out:
 			json.dump(world_data, pickle_out)
 	if load_button.draw():
-		# load in level data (first try JSON, fallback to pickle)
-		json_path = os.path.join(os.path.dirname(__file__), f'level{level}.json')
-		if path.exists(json_path):
-			with open(json_path, 'r', encoding='utf-8') as f:
-				world_data = json.load(f)
-		elif path.exists(f'level{level}_data'):
-			with open(f'level{level}_data', 'rb') as pickle_in:
-				world_data = pickle.load(pickle_in)
+		# load in level data (.lvl first, then JSON, then pickle); edit as plain lists
+		loaded = utils.load_level(level)
+		if loaded:
+			world_data = loaded.to_lists()
+		world_layer = None
 
 
 	#show the grid and draw the level tiles
@@ -203,6 +213,7 @@ while run:
 					world_data[y][x] -= 1
 					if world_data[y][x] < 0:
 						world_data[y][x] = 8
+				world_layer = None
 		if event.type == pygame.MOUSEBUTTONUP:
 			clicked = False
 		#up and down key presses to change level number
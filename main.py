@@ -1,41 +1,33 @@
 import os
 import pygame
 import utils
+import spatial
+import profiler
 from pygame import mixer
-import pickle
-from os import path
-import asyncio
-from typing import cast, Any
 import sys
+import time
 import traceback
-print(sys.executable)
-print(sys.version)
-print(">>> Cartofia web build: main.py starting")
 
-
-# --- Safe audio init ---
+# Importing this module only defines things: the display, audio, fonts, music
+# and sounds are set up by init() (called from Game), and images are decoded
+# on first use through utils.get_image.
 IS_WEB = sys.platform == 'emscripten'
-print(f"[cartofia] IS_WEB={IS_WEB} ASSET_DIR={utils.ASSET_DIR}")
-if IS_WEB:
-    # Web builds should not try to use pulseaudio
-    os.environ['SDL_AUDIODRIVER'] = 'dummy'
-else:
-    os.environ.setdefault("SDL_AUDIODRIVER", "pulseaudio")
-try:
-    pygame.mixer.pre_init(44100, -16, 2, 512)
-    mixer.init()
-except pygame.error as e:
-    print(f"[Warning] Audio init failed: {e}")
-    os.environ["SDL_AUDIODRIVER"] = "dummy"
-    try:
-        pygame.mixer.init()
-    except Exception:
-        pass
-
-pygame.init()
+# Headless: no window, no audio output, no music, no per-frame drawing; the
+# game logic is driven through Game.simulate() as fast as it will go.
+HEADLESS = os.environ.get('CARTOFIA_HEADLESS', '0') == '1'
 
 clock = pygame.time.Clock()
-fps = 60
+fps = int(os.environ.get('CARTOFIA_FPS', '60'))  # render cap only; 0 = uncapped
+
+# --- Fixed-timestep simulation ---
+# Physics (gravity, walk speed, patrol counters) is tuned per tick at 60 Hz,
+# so Game.run advances the logic in fixed SIM_DT ticks from an accumulator
+# (frame_ticks), independent of how fast frames are rendered, and draws
+# positions interpolated between the last two ticks.
+SIM_HZ = 60
+SIM_DT = 1.0 / SIM_HZ
+MAX_TICKS_PER_FRAME = 5    # catch-up budget per rendered frame
+MAX_FRAME_TIME = 0.25      # longer stalls (tab in background, debugger) are dropped
 DEBUG_OVERLAY_FRAMES = 180  # draw debug overlay for first N frames on web
 
 # # --- Fullscreen setup ---
@@ -84,104 +76,340 @@ else:
     screen_width = GW
     screen_height = GH
 
-screen = pygame.display.set_mode((screen_width, screen_height))
-pygame.display.set_caption("Cartofia (Web)" if IS_WEB else "Cartofia")
+screen = None  # opened by init()
 
 # Logical off-screen surface for consistent rendering across devices (used for web scaling)
-game_surface = pygame.Surface((GW, GH))
+game_surface = None
 
 # Scale factors: screen pixels → game pixels
 scale_x = screen_width / GW
 scale_y = screen_height / GH
 
+# --- Present stage: how game_surface reaches the display ---
+# 'smooth'  bilinear smoothscale to the whole window (default)
+# 'nearest' nearest-neighbour scale, much cheaper on low-end web clients
+# 'integer' nearest scale by a whole factor (or divisor), letterboxed
+PRESENT_MODES = ('smooth', 'nearest', 'integer')
+present_mode = os.environ.get('CARTOFIA_SCALE', 'smooth')
+if present_mode not in PRESENT_MODES:
+    present_mode = 'smooth'
+# Area of the screen covered by game_surface; scaled frames are written into
+# _present_buffer, which is only reallocated when this size changes.
+present_rect = pygame.Rect(0, 0, screen_width, screen_height)
+_present_buffer = None
+
+def _present_size(sw, sh):
+    if present_mode != 'integer':
+        return sw, sh
+    if sw >= GW and sh >= GH:
+        factor = min(sw // GW, sh // GH)
+        return GW * factor, GH * factor
+    divisor = max(-(-GW // max(sw, 1)), -(-GH // max(sh, 1)))
+    return GW // divisor, GH // divisor
+
 def update_scaling():
     """Recompute scale based on the real canvas size (WEB: canvas can resize)."""
-    global scale_x, scale_y, screen_width, screen_height
+    global scale_x, scale_y, screen_width, screen_height, present_rect, _present_buffer
     sw, sh = screen.get_size()
     screen_width, screen_height = sw, sh
-    scale_x = screen_width / GW
-    scale_y = screen_height / GH
+    rect = pygame.Rect((0, 0), _present_size(sw, sh))
+    rect.center = (sw // 2, sh // 2)
+    if rect != present_rect:
+        present_rect = rect
+        _present_buffer = None
+        screen.fill((0, 0, 0))  # clear letterbox bars once
+    scale_x = present_rect.width / GW
+    scale_y = present_rect.height / GH
+
+def set_present_mode(mode):
+    global present_mode
+    if mode not in PRESENT_MODES:
+        raise ValueError(f"unknown present mode {mode!r}, expected one of {PRESENT_MODES}")
+    present_mode = mode
+    update_scaling()
+
+def present():
+    """Copy game_surface to the screen: a plain blit at 1:1, else scale into a reused buffer."""
+    global _present_buffer
+    if present_rect.size == (GW, GH):
+        screen.blit(game_surface, present_rect)
+        return
+    if _present_buffer is None:
+        _present_buffer = pygame.Surface(present_rect.size, 0, game_surface)
+    if present_mode == 'smooth':
+        pygame.transform.smoothscale(game_surface, present_rect.size, _present_buffer)
+    else:
+        pygame.transform.scale(game_surface, present_rect.size, _present_buffer)
+    screen.blit(_present_buffer, present_rect)
 
 def screen_to_game_pos(pos):
     # Convert physical screen coords to game logical coords (useful for mouse handling on web)
-    return (int(pos[0] / scale_x), int(pos[1] / scale_y))
+    return (int((pos[0] - present_rect.x) / scale_x), int((pos[1] - present_rect.y) / scale_y))
 
 # Global draw surface: always the logical `game_surface`; scaled to the window each frame
-DRAW_SURFACE = game_surface
+DRAW_SURFACE = None
 
 
 
 
 # --- Fonts & colours ---
-# Use bundled or default font helper
-font = utils.default_font(70)
-font_score = utils.default_font(30)
+# Bundled or default font (utils.default_font), created by init()
+font = None
+font_score = None
 
 white = (255, 255, 255)
 blue = (0, 0, 255)
 
-# --- Game variables ---
+# --- Game settings ---
+# (per-game variables such as level, score and game_over live on GameState)
 tile_size = 50
-game_over = 0
-# Start menu only on desktop; web jumps straight in
-main_menu = False if IS_WEB else True
-level = 1
 max_levels = 11
-score = 0
 
 
-# --- Load images ---
-sun_img = utils.load_image('sun.png', alpha=True)
-bg_img = utils.load_image('sky.png', alpha=False)
-restart_img = utils.load_image('restart_btn.png', alpha=True)
-start_img = utils.load_image('start_btn.png', alpha=True)
-exit_img = utils.load_image('exit_btn.png', alpha=True)
+# --- Images ---
+# Decoded on first use and shared through utils.get_image's cache
+def background():
+    """Static backdrop baked into each World's tile layer (see World.rebuild_layer)."""
+    return [(utils.get_image('sky.png', alpha=False), (0, 0)),
+            (utils.get_image('sun.png', alpha=True), (290, 150))]
 
-# --- Load sounds ---
-# Prefer OGG for web, fallback to MP3
+def tile_images():
+    return {
+        1: utils.get_image("dirt.png", size=(tile_size, tile_size)),
+        2: utils.get_image("grass.png", size=(tile_size, tile_size)),
+    }
+
+# --- Sounds (loaded by init) ---
 music_path_ogg = os.path.join(utils.ASSET_DIR, 'music.ogg')
 music_path_mp3 = os.path.join(utils.ASSET_DIR, 'music.mp3')
-try:
-    if os.path.exists(music_path_ogg):
-        pygame.mixer.music.load(music_path_ogg)
-    elif os.path.exists(music_path_mp3):
-        pygame.mixer.music.load(music_path_mp3)
-    pygame.mixer.music.play(-1, 0.0, 5000)
-except Exception as e:
-    print('[Warning] Music load failed:', e)
-
-coin_fx = utils.load_sound('coin.wav')
-if coin_fx:
-    coin_fx.set_volume(0.5)
-jump_fx = utils.load_sound('jump.wav')
-if jump_fx:
-    jump_fx.set_volume(0.5)
-game_over_fx = utils.load_sound('game_over.wav')
-if game_over_fx:
-    game_over_fx.set_volume(0.5)
+coin_fx = None
+jump_fx = None
+game_over_fx = None
+
+def _init_audio(headless):
+    if headless:
+        os.environ['SDL_AUDIODRIVER'] = 'dummy'
+    elif IS_WEB:
+        # Web builds should not try to use pulseaudio
+        os.environ['SDL_AUDIODRIVER'] = 'dummy'
+    else:
+        os.environ.setdefault("SDL_AUDIODRIVER", "pulseaudio")
+    try:
+        pygame.mixer.pre_init(44100, -16, 2, 512)
+        mixer.init()
+    except pygame.error as e:
+        print(f"[Warning] Audio init failed: {e}")
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
+        try:
+            pygame.mixer.init()
+        except Exception:
+            pass
+
+def _load_sound(name):
+    snd = utils.load_sound(name)
+    if snd:
+        snd.set_volume(0.5)
+    return snd
+
+def _start_music(headless):
+    # Prefer OGG for web, fallback to MP3
+    try:
+        if headless:
+            pass
+        elif os.path.exists(music_path_ogg):
+            pygame.mixer.music.load(music_path_ogg)
+            pygame.mixer.music.play(-1, 0.0, 5000)
+        elif os.path.exists(music_path_mp3):
+            pygame.mixer.music.load(music_path_mp3)
+            pygame.mixer.music.play(-1, 0.0, 5000)
+    except Exception as e:
+        print('[Warning] Music load failed:', e)
+
+def load_audio(headless=None):
+    """Load the sound effects and start the music (once); a headless game
+    (default: CARTOFIA_HEADLESS) gets the sounds but no music."""
+    global coin_fx, jump_fx, game_over_fx
+    if coin_fx is not None:
+        return
+    _start_music(HEADLESS if headless is None else headless)
+    jump_fx = _load_sound('jump.wav')
+    game_over_fx = _load_sound('game_over.wav')
+    coin_fx = _load_sound('coin.wav')  # last: marks the sounds as loaded
+
+def init(headless=None):
+    """Open the display and audio and create the fonts.
+
+    Called by Game(); later calls return straight away while the display is open.
+    `headless` (default: CARTOFIA_HEADLESS) uses the dummy video and audio drivers.
+    The sounds and music come from load_audio() or the preload manifest.
+    """
+    global screen, game_surface, DRAW_SURFACE, font, font_score
+    if headless is None:
+        headless = HEADLESS
+    if screen is not None and pygame.display.get_surface() is screen:
+        if not headless or pygame.display.get_driver() == 'dummy':
+            return
+    print(sys.executable)
+    print(sys.version)
+    print(">>> Cartofia web build: main.py starting")
+    print(f"[cartofia] IS_WEB={IS_WEB} HEADLESS={headless} ASSET_DIR={utils.ASSET_DIR}")
+    if headless:
+        # as with CARTOFIA_HEADLESS: dummy drivers, even if pygame.init() (or a
+        # windowed Game) already opened real ones
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        if pygame.display.get_init() and pygame.display.get_driver() != 'dummy':
+            pygame.display.quit()
+        if pygame.mixer.get_init() and coin_fx is None:
+            pygame.mixer.quit()
+    _init_audio(headless)
+    pygame.init()
+
+    screen = pygame.display.set_mode((screen_width, screen_height))
+    pygame.display.set_caption("Cartofia (Web)" if IS_WEB else "Cartofia")
+    game_surface = pygame.Surface((GW, GH))
+    DRAW_SURFACE = game_surface
+    update_scaling()
+
+    font = utils.default_font(70)
+    font_score = utils.default_font(30)
 
 
 # Helper text drawing: use utils.draw_text(surface, text, font, color, x, y, center=False)
 
 
-def reset_level(level):
-    player.reset(100, GH - 130)
-    blob_group.empty()
-    platform_group.empty()
-    coin_group.empty()
-    lava_group.empty()
-    exit_group.empty()
+def lerp_pos(sprite, alpha):
+    """Draw position of a moving sprite, `alpha` of the way from its previous tick to its current one."""
+    x, y = sprite.rect.topleft
+    if alpha >= 1.0:
+        return x, y
+    px, py = sprite.prev_pos
+    return (round(px + (x - px) * alpha), round(py + (y - py) * alpha))
+
+# --- Scripted input ---
+def make_keys(jump=False, left=False, right=False):
+    """Key state in the shape Player.update reads from pygame.key.get_pressed()."""
+    return {pygame.K_SPACE: jump, pygame.K_a: left, pygame.K_d: right}
+
+NO_KEYS = make_keys()
+
+# One tick of input as a bitmask (replays, env actions). KEY_RESTART marks
+# the restart button having been pressed just before that tick.
+KEY_JUMP = 1
+KEY_LEFT = 2
+KEY_RIGHT = 4
+KEY_RESTART = 8
+MASK_KEYS = [make_keys(bool(m & KEY_JUMP), bool(m & KEY_LEFT), bool(m & KEY_RIGHT)) for m in range(8)]
+
+def key_mask(keys):
+    return ((KEY_JUMP if keys[pygame.K_SPACE] else 0) | (KEY_LEFT if keys[pygame.K_a] else 0)
+            | (KEY_RIGHT if keys[pygame.K_d] else 0))
+
+class ScriptedInput():
+    """Feeds Player.update a fixed key script instead of the keyboard.
+
+    A script is a list of (ticks, keys) steps, keys being a set of 'space',
+    'a' and 'd'. As text, one step per line: `<ticks> [space] [a] [d]`
+    (a bare count holds nothing, `#` starts a comment). Once the script runs
+    out every key is released, or it starts over with loop=True.
+    """
+    def __init__(self, steps, loop=False):
+        self.steps = [(int(ticks), make_keys('space' in keys, 'a' in keys, 'd' in keys))
+                      for ticks, keys in steps]
+        self.loop = loop
+        self.rewind()
+
+    @classmethod
+    def parse(cls, text, loop=False):
+        steps = []
+        for line in text.splitlines():
+            fields = line.split('#', 1)[0].split()
+            if fields:
+                steps.append((int(fields[0]), set(fields[1:])))
+        return cls(steps, loop)
+
+    @classmethod
+    def load(cls, path, loop=False):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.parse(f.read(), loop)
+
+    def rewind(self):
+        self._step = 0
+        self._left = self.steps[0][0] if self.steps else 0
+
+    def next(self):
+        """Key state for the next tick."""
+        while self._left <= 0:
+            self._step += 1
+            if self._step >= len(self.steps):
+                if not self.loop or not self.steps:
+                    return NO_KEYS
+                self._step = 0
+            self._left = self.steps[self._step][0]
+        self._left -= 1
+        return self.steps[self._step][1]
+
+
+class Replay():
+    """A run's per-tick input, run-length encoded, from a starting level.
+
+    Game(record=path) records one (every tick's key mask, plus KEY_RESTART
+    when the restart button was pressed) and saves it on quit; play() re-runs
+    it headless at full speed, Game(replay=...) at real time on screen. The
+    game logic is deterministic, so the same replay always ends the same way;
+    `result` is how the recorded run ended, to compare against.
+    """
+    def __init__(self, level, runs=None, result=None):
+        self.level = level
+        self.runs = runs if runs is not None else []
+        self.result = result
+        self.restart_pending = False
+
+    @classmethod
+    def load(cls, path):
+        info, runs = utils.load_replay(path)
+        result = {'level': info['end_level'], 'score': info['end_score'], 'game_over': info['end_game_over']}
+        return cls(info['level'], runs, result)
+
+    def save(self, path, state):
+        """Write the replay, recording how `state` (the recorded game) ended."""
+        self.result = {'level': state.level, 'score': state.score, 'game_over': state.game_over}
+        utils.save_replay(path, {'level': self.level, 'end_level': state.level,
+                                 'end_game_over': state.game_over, 'end_score': state.score}, self.runs)
+
+    @property
+    def ticks(self):
+        return sum(count for count, _ in self.runs)
+
+    def record(self, keys):
+        """Append one tick of `keys` (a pygame key state or make_keys dict)."""
+        mask = key_mask(keys)
+        if self.restart_pending:
+            mask |= KEY_RESTART
+            self.restart_pending = False
+        if self.runs and self.runs[-1][1] == mask:
+            self.runs[-1][0] += 1
+        else:
+            self.runs.append([1, mask])
+
+    def masks(self):
+        for count, mask in self.runs:
+            for _ in range(count):
+                yield mask
+
+    def play(self, state=None):
+        """Re-run the replay on a fresh headless GameState as fast as it goes; returns the state."""
+        if state is None:
+            state = GameState(self.level, headless=True)
+        for mask in self.masks():
+            state.apply(mask)
+        return state
 
-    world_data = utils.load_level_data(level)
-    if not world_data:
-        # Fallback to an empty 20x20 level
-        world_data = [[0 for _ in range(20)] for __ in range(20)]
-    world = World(world_data)
-    score_coin = Coin(tile_size // 2, tile_size // 2)
-    coin_group.add(score_coin)
-    return world
 
 # --- Button Class ---
+def button_images():
+    """The restart, start and exit button images."""
+    return tuple(utils.get_image(name) for name in ('restart_btn.png', 'start_btn.png', 'exit_btn.png'))
+
 class Button():
     def __init__(self, x, y, image):
         self.image = image
@@ -209,17 +437,23 @@ class Button():
 
 # --- Player Class ---
 class Player():
-    def __init__(self, x, y):
+    _frames = None
+    _frames_generation = None  # utils.image_generation the frames were built at
+
+    def __init__(self, x, y, state):
+        self.state = state  # the GameState whose world the player moves through
         self.reset(x, y)
 
-    def update(self, game_over):
+    def update(self, game_over, key=None):
+        self.prev_pos = self.rect.topleft
         dx = 0
         dy = 0
         walk_cooldown = 5
         col_thresh = 20
 
         if game_over == 0:
-            key = pygame.key.get_pressed()
+            if key is None:
+                key = pygame.key.get_pressed()
             if key[pygame.K_SPACE] and not self.jumped and not self.in_air:
                 if jump_fx:
                     jump_fx.play()
@@ -252,31 +486,26 @@ class Player():
                 self.vel_y = 10
             dy += self.vel_y
 
-            self.in_air = True
-            for tile in world.tile_list:
-                if tile[1].colliderect(self.rect.x + dx, self.rect.y, self.width, self.height):
-                    dx = 0
-                if tile[1].colliderect(self.rect.x, self.rect.y + dy, self.width, self.height):
-                    if self.vel_y < 0:
-                        dy = tile[1].bottom - self.rect.top
-                        self.vel_y = 0
-                    elif self.vel_y >= 0:
-                        dy = tile[1].top - self.rect.bottom
-                        self.vel_y = 0
-                        self.in_air = False
+            world = self.state.world
+            dx, dy, self.vel_y, self.in_air = world.collide_tiles(self.rect, dx, dy, self.vel_y)
 
-            if pygame.sprite.spritecollide(cast(Any, self), blob_group, False):
+            if world.blob_hash.collide(self.rect):
                 game_over = -1
+                self.death_cause = 'enemy'
                 if game_over_fx:
                     game_over_fx.play()
-            if pygame.sprite.spritecollide(cast(Any, self), lava_group, False):
+            if world.lava_hash.collide(self.rect):
                 game_over = -1
+                self.death_cause = 'lava'
                 if game_over_fx:
                     game_over_fx.play()
-            if pygame.sprite.spritecollide(cast(Any, self), exit_group, False):
+            if world.exit_hash.collide(self.rect):
                 game_over = 1
 
-            for platform in platform_group:
+            # every platform this move could touch: the swept rect, padded for
+            # the snaps and carries the loop applies to self.rect as it goes
+            reach = self.rect.union(self.rect.move(dx, dy)).inflate(tile_size * 2, tile_size * 2)
+            for platform in world.platform_hash.query(reach):
                 if platform.rect.colliderect(self.rect.x + dx, self.rect.y, self.width, self.height):
                     dx = 0
                 if platform.rect.colliderect(self.rect.x, self.rect.y + dy, self.width, self.height):
@@ -295,59 +524,230 @@ class Player():
 
         elif game_over == -1:
             self.image = self.dead_image
-            utils.draw_text(DRAW_SURFACE, "GAME OVER!", font, blue, GW // 2, GH // 2, center=True)
             if self.rect.y > 200:
                 self.rect.y -= 5
 
-        DRAW_SURFACE.blit(self.image, self.rect)
-        # screen.blit(self.image, self.rect)  # original
         return game_over
 
+    def draw(self, surface, game_over, alpha=1.0, offset=(0, 0)):
+        """Blit the player (shifted up and left by `offset`, the camera position),
+        plus the GAME OVER banner once dead."""
+        if game_over == -1:
+            utils.draw_text(surface, "GAME OVER!", font, blue, GW // 2, GH // 2, center=True)
+        x, y = lerp_pos(self, alpha)
+        surface.blit(self.image, (x - offset[0], y - offset[1]))
+        # screen.blit(self.image, self.rect)  # original
+
+    def draw_rects(self, game_over, alpha=1.0):
+        """The rects draw() will touch (the image may be larger than the hit rect)."""
+        rects = [self.image.get_rect(topleft=lerp_pos(self, alpha))]
+        if game_over == -1:
+            banner = utils.render_text(font, "GAME OVER!", blue)
+            rects.append(banner.get_rect(center=(GW // 2, GH // 2)))
+        return rects
+
+
+    @classmethod
+    def load_frames(cls):
+        """Build the (right, left, dead) animation frames once (and again after
+        utils.evict_images); every Player shares them."""
+        if cls._frames is None or cls._frames_generation != utils.image_generation:
+            images_right = []
+            images_left = []
+            for num in range(1, 5):
+                img_right = utils.get_image(f"c{num}.png", size=(40, 80))
+                img_left = pygame.transform.flip(img_right, True, False)
+                images_right.append(img_right)
+                images_left.append(img_left)
+            dead_image = utils.get_image("ghost.png")
+            cls._frames = (tuple(images_right), tuple(images_left), dead_image)
+            cls._frames_generation = utils.image_generation
+        return cls._frames
 
     def reset(self, x, y):
-        self.images_right = []
-        self.images_left = []
-        for num in range(1, 5):
-            img_right = utils.load_image(f"c{num}.png")
-            img_right = pygame.transform.scale(img_right, (40, 80))
-            img_left = pygame.transform.flip(img_right, True, False)
-            self.images_right.append(img_right)
-            self.images_left.append(img_left)
-        self.dead_image = utils.load_image("ghost.png")
+        self.images_right, self.images_left, self.dead_image = self.load_frames()
+        self.index = 0
+        self.counter = 0
         self.image = self.images_right[0]
         self.rect = self.image.get_rect()
         self.rect.x = x
         self.rect.y = y
+        self.prev_pos = self.rect.topleft
         self.width = self.image.get_width()
         self.height = self.image.get_height()
         self.vel_y = 0
         self.jumped = False
         self.direction = 0
         self.in_air = True
+        self.death_cause = None  # 'enemy' or 'lava' once dead
 
 # --- Environment Classes ---
-class World():
+BROAD_PHASE_CELL = tile_size * 2
+PATROL_SPEED = 1  # px per tick for Enemy and Platform
+PATROL_RANGE = 50  # ticks each way before a patrol turns round
+# Advance all enemies and platforms as NumPy arrays (patrols.PatrolArrays)
+# instead of one update() call each; needs NumPy
+NUMPY_PATROLS = os.environ.get('CARTOFIA_NUMPY_PATROLS', '0') == '1'
+
+def _numpy_patrols_available():
+    import importlib.util
+    if importlib.util.find_spec('numpy') is None:
+        print("[cartofia] NumPy patrols unavailable (no numpy), using per-sprite updates")
+        return False
+    return True
+
+def bake_layer(tiles, size, background=None, convert=True):
+    """Compose (image, pos) tiles, over an optional backdrop, into one surface."""
+    if background:
+        # opaque layer in game_surface's format: the backdrop is part of it,
+        # so Game.run skips its own blits
+        layer = pygame.Surface(size, 0, game_surface)
+        for img, pos in background:
+            layer.blit(img, pos)
+    else:
+        layer = pygame.Surface(size, pygame.SRCALPHA)
+    for img, pos in tiles:
+        layer.blit(img, pos)
+    if convert and not background and pygame.display.get_surface() is not None:
+        layer = layer.convert_alpha()
+    return layer
+
+def layer_size(data, background=None):
+    width = max((len(row) for row in data), default=0) * tile_size
+    height = len(data) * tile_size
+    if background:
+        return max(width, GW), max(height, GH)
+    return width, height
+
+def scrolls(data):
+    """True for a level bigger than the screen: it is drawn from TileChunks
+    around a camera instead of one level-sized layer."""
+    width, height = layer_size(data)
+    return width > GW or height > GH
+
+def prebuild_layer(data):
+    """LevelCache builder: a level's backdrop + tile layer, made without building a World.
+
+    Runs on the prefetch thread; the images come from utils.get_image, which
+    locks while it fills its cache, and are only blitted from.
+    Scrolling levels get no layer (their chunks are baked as they come into view).
+    """
+    if scrolls(data):
+        return None
+    images = tile_images()
+    backdrop = background()
+    tiles = []
+    for row_count, row in enumerate(data):
+        for col_count, tile in enumerate(row):
+            img = images.get(tile)
+            if img is not None:
+                tiles.append((img, (col_count * tile_size, row_count * tile_size)))
+    return bake_layer(tiles, layer_size(data, backdrop), backdrop, convert=False)
+
+CHUNK_TILES = 16  # tiles per side of a TileChunks chunk
+CHUNK_KEEP = 1    # chunks kept beyond each edge of the view before they are dropped
+
+class TileChunks:
+    """The tile layer of a level bigger than the screen, in CHUNK_TILES-square
+    surfaces. A chunk is baked when it first comes into view and dropped once
+    it is more than CHUNK_KEEP chunks outside it, so memory and drawing follow
+    the viewport, not the level size.
+    """
     def __init__(self, data):
+        self.data = data
+        self.rows = len(data)
+        self.cols = max((len(row) for row in data), default=0)
+        self.size = CHUNK_TILES * tile_size  # chunk side in px
+        self.surfaces = {}                   # (cx, cy) -> baked chunk
+        self.baked = 0                       # bakes so far (a chunk back in view is baked again)
+
+    def _bake(self, cx, cy):
+        images = tile_images()
+        row0 = cy * CHUNK_TILES
+        col0 = cx * CHUNK_TILES
+        tiles = []
+        for row in range(row0, min(row0 + CHUNK_TILES, self.rows)):
+            cells = self.data[row]
+            for col in range(col0, min(col0 + CHUNK_TILES, len(cells))):
+                img = images.get(cells[col])
+                if img is not None:
+                    tiles.append((img, ((col - col0) * tile_size, (row - row0) * tile_size)))
+        self.baked += 1
+        chunk = bake_layer(tiles, (self.size, self.size))
+        # RLE lets the blit skip the empty (transparent) runs, most of a chunk
+        chunk.set_alpha(255, pygame.RLEACCEL)
+        return chunk
+
+    def _range(self, view, margin=0):
+        """(x0, y0, x1, y1) chunk indices overlapping `view`, grown by `margin` chunks."""
+        size = self.size
+        last_x = (self.cols * tile_size - 1) // size
+        last_y = (self.rows * tile_size - 1) // size
+        return (max(0, view.left // size - margin), max(0, view.top // size - margin),
+                min(last_x, (view.right - 1) // size + margin), min(last_y, (view.bottom - 1) // size + margin))
+
+    def draw(self, surface, view):
+        """Blit the chunks overlapping `view` (level px) onto `surface`, which shows `view`."""
+        surfaces = self.surfaces
+        size = self.size
+        x0, y0, x1, y1 = self._range(view)
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                chunk = surfaces.get((cx, cy))
+                if chunk is None:
+                    chunk = surfaces[cx, cy] = self._bake(cx, cy)
+                surface.blit(chunk, (cx * size - view.x, cy * size - view.y))
+        x0, y0, x1, y1 = self._range(view, CHUNK_KEEP)
+        for key in [key for key in surfaces if not (x0 <= key[0] <= x1 and y0 <= key[1] <= y1)]:
+            del surfaces[key]
+
+    def clear(self):
+        self.surfaces.clear()
+
+# Recently played levels (grid + pre-built layer), with the next level
+# prefetched in the background while the current one is played
+level_cache = utils.LevelCache(maxsize=4, builder=None if HEADLESS else prebuild_layer)
+# Just the grids, for game states that are never drawn (GameState(headless=True))
+grid_cache = utils.LevelCache(maxsize=max_levels)
+
+class World():
+    def __init__(self, data, background=None, layer=None, state=None):
+        # sprites are added to the groups of `state` (a GameState); a bare
+        # World gets a GameState of its own
+        if state is None:
+            state = GameState(None)
+        self.state = state
+        blob_group = state.blob_group
+        platform_group = state.platform_group
+        lava_group = state.lava_group
+        coin_group = state.coin_group
+        exit_group = state.exit_group
         self.tile_list = []
-        dirt_img = utils.load_image("dirt.png")
-        grass_img = utils.load_image("grass.png")
+        # tile_grid[row][col] holds the solid tile's rect (or None) so collision
+        # queries only look at the cells around the player instead of every tile
+        self.tile_grid = [[None] * len(row) for row in data]
+        images = tile_images()
+        dirt_img = images[1]
+        grass_img = images[2]
 
         row_count = 0
         for row in data:
             col_count = 0
             for tile in row:
                 if tile == 1:
-                    img = pygame.transform.scale(dirt_img, (tile_size, tile_size))
+                    img = dirt_img
                     img_rect = img.get_rect()
                     img_rect.x = col_count * tile_size
                     img_rect.y = row_count * tile_size
                     self.tile_list.append((img, img_rect))
+                    self.tile_grid[row_count][col_count] = img_rect
                 if tile == 2:
-                    img = pygame.transform.scale(grass_img, (tile_size, tile_size))
+                    img = grass_img
                     img_rect = img.get_rect()
                     img_rect.x = col_count * tile_size
                     img_rect.y = row_count * tile_size
                     self.tile_list.append((img, img_rect))
+                    self.tile_grid[row_count][col_count] = img_rect
                 if tile == 3:
                     blob_group.add(Enemy(col_count * tile_size, row_count * tile_size + 15))
                 if tile == 4:
@@ -363,191 +763,848 @@ class World():
                 col_count += 1
             row_count += 1
 
-    def draw(self):
-        for tile in self.tile_list:
-            DRAW_SURFACE.blit(tile[0], tile[1])
-            # screen.blit(tile[0], tile[1])  # original
-
+        # what restore() puts back: the patrolling sprites and every coin
+        self.patrols = list(blob_group) + list(platform_group)
+        self.coins = list(coin_group)
+
+        # broad phase for the player's sprite collisions: lava, coins and exits
+        # are filed once, enemies and platforms are re-filed every tick
+        self.lava_hash = spatial.SpatialHash(BROAD_PHASE_CELL, lava_group)
+        self.coin_hash = spatial.SpatialHash(BROAD_PHASE_CELL, coin_group)
+        self.exit_hash = spatial.SpatialHash(BROAD_PHASE_CELL, exit_group)
+        # with the NumPy backend the patrols' arrays are their broad phase
+        self.vectorized = state.numpy_patrols
+        if self.vectorized:
+            import patrols
+            self.blob_hash = patrols.PatrolArrays(blob_group, PATROL_RANGE)
+            self.platform_hash = patrols.PatrolArrays(platform_group, PATROL_RANGE)
+        else:
+            self.blob_hash = spatial.SpatialHash(BROAD_PHASE_CELL, blob_group)
+            self.platform_hash = spatial.SpatialHash(BROAD_PHASE_CELL, platform_group)
+
+        # tiles never move, so they are composed once into `layer` and drawn
+        # with a single blit; call rebuild_layer() after changing the tiles.
+        # A layer pre-built by the level cache (prebuild_layer) is used as is.
+        self.background = background
+        self.layer = layer
+        # a level bigger than the screen scrolls: see TileChunks and Game.camera
+        self.size = layer_size(data)
+        self.chunks = TileChunks(data) if scrolls(data) else None
+        if layer is None and self.chunks is None and not state.headless:
+            self.rebuild_layer()
+
+    def restore(self):
+        """Return the level to how it was built, reusing its sprites, layer and hashes.
+
+        Patrols go back to their start positions and collected coins are re-added,
+        so restarting after a death needs no level load or asset work.
+        """
+        for sprite in self.patrols:
+            sprite.restart()
+        for coin in self.coins:
+            if not coin.alive():
+                self.state.coin_group.add(coin)
+                self.coin_hash.add(coin)
+        self.blob_hash.refresh()
+        self.platform_hash.refresh()
+
+    def sync_patrols(self):
+        """Bring every patrol sprite up to date before reading them all; the NumPy
+        backend only writes back the sprites its queries return."""
+        if self.vectorized:
+            self.blob_hash.sync()
+            self.platform_hash.sync()
+
+    def rebuild_layer(self):
+        if self.chunks is not None:
+            self.chunks.clear()
+            return
+        self.layer = bake_layer(self.tile_list, layer_size(self.tile_grid, self.background), self.background)
+
+    def collide_tiles(self, rect, dx, dy, vel_y):
+        """Resolve a move of `rect` by (dx, dy) against the solid tiles.
+
+        Equivalent to testing every entry of `tile_list` in order (horizontal
+        block first, then vertical snap to the tile's top or bottom), but only
+        the grid cells the moved rect can touch are visited. Rows are walked
+        top to bottom so a snap that changes dy is seen by the rows after it,
+        exactly like the linear scan.
+        Returns (dx, dy, vel_y, in_air).
+        """
+        in_air = True
+        if not self.tile_grid:
+            return dx, dy, vel_y, in_air
+        rows = len(self.tile_grid)
+        width, height = rect.width, rect.height
+        x, y = rect.x, rect.y
+
+        # columns touched by the horizontal probe and by the vertical probe
+        hx0 = (x + dx) // tile_size
+        hx1 = (x + dx + width - 1) // tile_size
+        vx0 = x // tile_size
+        vx1 = (x + width - 1) // tile_size
+        h_row0 = y // tile_size
+        h_row1 = (y + height - 1) // tile_size
+
+        row = max(0, min(h_row0, (y + dy) // tile_size))
+        while row < rows:
+            # dy shrinks when a tile stops the vertical probe
+            v_row1 = (y + dy + height - 1) // tile_size
+            if row > h_row1 and row > v_row1:
+                break
+            cells = self.tile_grid[row]
+            in_h = h_row0 <= row <= h_row1
+            col0 = min(hx0 if in_h else vx0, vx0)
+            col1 = max(hx1 if in_h else vx1, vx1)
+            for col in range(max(0, col0), min(len(cells), col1 + 1)):
+                tile = cells[col]
+                if tile is None:
+                    continue
+                if tile.colliderect(x + dx, y, width, height):
+                    dx = 0
+                if tile.colliderect(x, y + dy, width, height):
+                    if vel_y < 0:
+                        dy = tile.bottom - rect.top
+                        vel_y = 0
+                    else:
+                        dy = tile.top - rect.bottom
+                        vel_y = 0
+                        in_air = False
+            row += 1
+        return dx, dy, vel_y, in_air
+
+    def draw(self, view=None):
+        """Draw the backdrop and tiles; a scrolling level draws the part in `view` (level px)."""
+        if self.chunks is None:
+            DRAW_SURFACE.blit(self.layer, (0, 0))
+            return
+        for img, pos in self.background or ():
+            DRAW_SURFACE.blit(img, pos)  # the backdrop doesn't scroll
+        self.chunks.draw(DRAW_SURFACE, view)
+        # for tile in self.tile_list:
+        #     screen.blit(tile[0], tile[1])  # original per-tile blits
+
+
+class SharedImage:
+    """Class attribute: one image for every instance of a sprite type, fetched
+    from utils.get_image on first use (so `import main` stays free of loading)
+    and again after utils.evict_images."""
+    def __init__(self, name, size=None):
+        self.name = name
+        self.size = size
+        self.image = None
+        self.generation = None  # utils.image_generation when fetched
+
+    def __get__(self, sprite, owner=None):
+        if self.generation != utils.image_generation:
+            self.image = utils.get_image(self.name, size=self.size)
+            self.generation = utils.image_generation
+        return self.image
+
+class Entity(pygame.sprite.Sprite):
+    """Base of the level's sprites: an instance holds its rect and its own state
+    in __slots__, and no group set or image (the image is a SharedImage on the
+    class). Levels with thousands of coins stay small.
+
+    pygame Groups take it like any Sprite. Sprite.__init__ is not called, and
+    the groups are kept in a tuple (it is almost always in one) instead. Sprite
+    has no __slots__, so a __dict__ could still be made, but nothing fills one.
+    """
+    __slots__ = ('rect', '_groups')
+
+    def __init__(self, rect):
+        self.rect = rect
+        self._groups = ()
+
+    def add_internal(self, group):
+        if group not in self._groups:
+            self._groups += (group,)
+
+    def remove_internal(self, group):
+        self._groups = tuple(g for g in self._groups if g is not group)
+
+    def add(self, *groups):
+        for group in groups:
+            group.add(self)
+
+    def remove(self, *groups):
+        for group in groups:
+            group.remove(self)
+
+    def groups(self):
+        return list(self._groups)
+
+    def alive(self):
+        return bool(self._groups)
+
+    def kill(self):
+        for group in self._groups:
+            group.remove_internal(self)
+        self._groups = ()
+
+    def __repr__(self):
+        return f"<{type(self).__name__} Entity(in {len(self._groups)} groups)>"
+
+class Enemy(Entity):
+    __slots__ = ('start_pos', 'prev_pos', 'move_direction', 'move_counter')
+    image = SharedImage("blob.png")
 
-class Enemy(pygame.sprite.Sprite):
     def __init__(self, x, y):
-        super().__init__()
-        self.image = utils.load_image("blob.png")
-        self.rect = self.image.get_rect(topleft=(x, y))
+        super().__init__(self.image.get_rect(topleft=(x, y)))
+        self.start_pos = self.rect.topleft
+        self.restart()
+
+    def restart(self):
+        """Back to the start of the patrol."""
+        self.rect.topleft = self.prev_pos = self.start_pos
         self.move_direction = 1
         self.move_counter = 0
 
     def update(self):
         self.rect.x += self.move_direction
         self.move_counter += 1
-        if abs(self.move_counter) > 50:
+        if abs(self.move_counter) > PATROL_RANGE:
             self.move_direction *= -1
             self.move_counter *= -1
 
-class Platform(pygame.sprite.Sprite):
+class Platform(Entity):
+    __slots__ = ('start_pos', 'prev_pos', 'move_x', 'move_y', 'move_direction', 'move_counter')
+    image = SharedImage("platform.png", size=(tile_size, tile_size // 2))
+
     def __init__(self, x, y, move_x, move_y):
-        super().__init__()
-        img = utils.load_image("platform.png")
-        self.image = pygame.transform.scale(img, (tile_size, tile_size // 2))
-        self.rect = self.image.get_rect(topleft=(x, y))
-        self.move_counter = 0
-        self.move_direction = 1
+        super().__init__(self.image.get_rect(topleft=(x, y)))
+        self.start_pos = self.rect.topleft
         self.move_x = move_x
         self.move_y = move_y
+        self.restart()
+
+    def restart(self):
+        """Back to the start of the patrol."""
+        self.rect.topleft = self.prev_pos = self.start_pos
+        self.move_counter = 0
+        self.move_direction = 1
 
     def update(self):
         self.rect.x += self.move_direction * self.move_x
         self.rect.y += self.move_direction * self.move_y
         self.move_counter += 1
-        if abs(self.move_counter) > 50:
+        if abs(self.move_counter) > PATROL_RANGE:
             self.move_direction *= -1
             self.move_counter *= -1
 
-class Lava(pygame.sprite.Sprite):
-    def __init__(self, x, y):
-        super().__init__()
-        img = utils.load_image("lava.png")
-        self.image = pygame.transform.scale(img, (tile_size, tile_size // 2))
-        self.rect = self.image.get_rect(topleft=(x, y))
+class Lava(Entity):
+    __slots__ = ()
+    image = SharedImage("lava.png", size=(tile_size, tile_size // 2))
 
-class Coin(pygame.sprite.Sprite):
     def __init__(self, x, y):
-        super().__init__()
-        img = utils.load_image("coin.png")
-        self.image = pygame.transform.scale(img, (tile_size // 2, tile_size // 2))
-        self.rect = self.image.get_rect(center=(x, y))
+        super().__init__(self.image.get_rect(topleft=(x, y)))
+
+class Coin(Entity):
+    __slots__ = ()
+    image = SharedImage("coin.png", size=(tile_size // 2, tile_size // 2))
 
-class Exit(pygame.sprite.Sprite):
     def __init__(self, x, y):
-        super().__init__()
-        img = utils.load_image("exit.png")
-        self.image = pygame.transform.scale(img, (tile_size, int(tile_size * 1.5)))
-        self.rect = self.image.get_rect(topleft=(x, y))
-
-# --- Setup ---
-player = Player(100, GH - 130)
-blob_group = pygame.sprite.Group()
-platform_group = pygame.sprite.Group()
-lava_group = pygame.sprite.Group()
-coin_group = pygame.sprite.Group()
-exit_group = pygame.sprite.Group()
-score_coin = Coin(tile_size // 2, tile_size // 2)
-coin_group.add(score_coin)
-
-world_data = utils.load_level_data(level)
-if not world_data:
-    world_data = [[0 for _ in range(20)] for __ in range(20)]
-world = World(world_data)
-
-restart_button = Button(GW // 2 - 50, GH // 2 + 100, restart_img)
-start_button = Button(GW // 2 - 350, GH // 2, start_img)
-exit_button = Button(GW // 2 + 150, GH // 2, exit_img)
+        super().__init__(self.image.get_rect(center=(x, y)))
 
-class Game:
-    def __init__(self):
-        # make major game objects available as globals for backwards compatibility
-        global player, blob_group, platform_group, lava_group, coin_group, exit_group
-        global world, score_coin, restart_button, start_button, exit_button
-        player = Player(100, GH - 130)
-        blob_group = pygame.sprite.Group()
-        platform_group = pygame.sprite.Group()
-        lava_group = pygame.sprite.Group()
-        coin_group = pygame.sprite.Group()
-        exit_group = pygame.sprite.Group()
-        score_coin = Coin(tile_size // 2, tile_size // 2)
-        coin_group.add(score_coin)
-        # load world
-        world_data = utils.load_level_data(level)
+class Exit(Entity):
+    __slots__ = ()
+    image = SharedImage("exit.png", size=(tile_size, int(tile_size * 1.5)))
+
+    def __init__(self, x, y):
+        super().__init__(self.image.get_rect(topleft=(x, y)))
+
+# --- Game state ---
+class GameState():
+    """One game's player, sprite groups, World, level, score and game_over.
+
+    Nothing here touches the display, so any number of states can be stepped
+    side by side in one process (tick/simulate); Game draws one of them.
+    A headless state skips building the static tile layers it would draw.
+    """
+    def __init__(self, level=1, headless=HEADLESS, numpy_patrols=None):
+        self.level = level
+        self.headless = headless
+        if numpy_patrols is None:
+            numpy_patrols = NUMPY_PATROLS
+        self.numpy_patrols = numpy_patrols and _numpy_patrols_available()
+        self.score = 0
+        self.game_over = 0
+        self.player = Player(100, GH - 130, self)
+        self.blob_group = pygame.sprite.Group()
+        self.platform_group = pygame.sprite.Group()
+        self.lava_group = pygame.sprite.Group()
+        self.coin_group = pygame.sprite.Group()
+        self.exit_group = pygame.sprite.Group()
+        # the HUD coin goes in before World so it is part of the coin broad phase
+        self.score_coin = Coin(tile_size // 2, tile_size // 2)
+        self.coin_group.add(self.score_coin)
+        self.world = None
+        self.profiler = None  # a profiler.FrameProfiler to charge the tick phases to
+        if level is not None:
+            self.world = self.build_world(level)
+
+    def build_world(self, level):
+        """World for `level` from the level cache; starts prefetching the next level."""
+        world_data, layer = (grid_cache if self.headless else level_cache).get(level)
         if not world_data:
+            # Fallback to an empty 20x20 level
             world_data = [[0 for _ in range(20)] for __ in range(20)]
-        world = World(world_data)
-        restart_button = Button(GW // 2 - 50, GH // 2 + 100, restart_img)
-        start_button = Button(GW // 2 - 350, GH // 2, start_img)
-        exit_button = Button(GW // 2 + 150, GH // 2, exit_img)
-        if IS_WEB:
-            # WEB: skip menu entirely to avoid hit-test quirks and get straight into gameplay
-            global main_menu
+            layer = None
+        world = World(world_data, background(), layer, self)
+        if level < max_levels:
+            (grid_cache if self.headless else level_cache).prefetch(level + 1)
+        return world
+
+    def reset_level(self, level):
+        """Start `level` from scratch with a newly built World (score is kept)."""
+        self.player.reset(100, GH - 130)
+        for group in (self.blob_group, self.platform_group, self.coin_group,
+                      self.lava_group, self.exit_group):
+            group.empty()
+        self.score_coin = Coin(tile_size // 2, tile_size // 2)
+        self.coin_group.add(self.score_coin)
+        self.level = level
+        self.world = self.build_world(level)
+        self.game_over = 0
+        return self.world
+
+    def restart_level(self):
+        """Replay the current level in place after a death (see World.restore)."""
+        self.player.reset(100, GH - 130)
+        self.world.restore()
+        self.score = 0
+        self.game_over = 0
+
+    def press_restart(self):
+        """What the restart button does: replay the level after a death, or start
+        over from level 1 after winning."""
+        if self.game_over == 1:
+            self.reset_level(1)
+            self.score = 0
+        else:
+            self.restart_level()
+
+    def apply(self, mask):
+        """One tick of recorded input (see Replay), the way Game.step runs it."""
+        if mask & KEY_RESTART:
+            self.press_restart()
+        collected = self.tick(MASK_KEYS[mask & 7])
+        if self.game_over == 1:
+            self.advance_level()
+        return collected
+
+    def advance_level(self):
+        """After reaching an exit, load the next level; False if it was the last one."""
+        if self.level >= max_levels:
+            return False
+        self.reset_level(self.level + 1)
+        return True
+
+    def tick(self, keys=None):
+        """Advance the game logic by one frame; returns the coins collected.
+
+        `keys` defaults to the live keyboard state (see make_keys/ScriptedInput).
+        """
+        world = self.world
+        prof = self.profiler
+        if world.vectorized:
+            moving = self.game_over == 0
+            world.blob_hash.step(moving)
+            world.platform_hash.step(moving)
+        else:
+            for group in (self.blob_group, self.platform_group):
+                for sprite in group:
+                    sprite.prev_pos = sprite.rect.topleft
+            if self.game_over == 0:
+                self.blob_group.update()
+                self.platform_group.update()
+                # patrols move at most PATROL_SPEED px per tick
+                world.blob_hash.moved(PATROL_SPEED)
+                world.platform_hash.moved(PATROL_SPEED)
+        if prof:
+            prof.lap('patrols')
+        collected = world.coin_hash.collide(self.player.rect)
+        for coin in collected:
+            coin.kill()
+            world.coin_hash.remove(coin)
+        if collected:
+            self.score += 1
+            if coin_fx:
+                coin_fx.play()
+        if prof:
+            prof.lap('coins')
+        self.game_over = self.player.update(self.game_over, keys)
+        if prof:
+            prof.lap('player')
+        return collected
+
+    def simulate(self, frames, inputs=None, advance=True):
+        """Run up to `frames` logic ticks with no drawing and no frame limiter.
+
+        Keys come from `inputs` (e.g. a ScriptedInput; idle when None). Levels
+        advance on reaching the exit (with advance=False the run stops there);
+        the run stops early when the player dies or finishes the last level.
+        Returns a summary including simulated fps.
+        """
+        start = time.perf_counter()
+        ticks = 0
+        while ticks < frames:
+            self.tick(inputs.next() if inputs else NO_KEYS)
+            ticks += 1
+            if self.game_over == -1:
+                break
+            if self.game_over == 1 and not (advance and self.advance_level()):
+                break
+        seconds = time.perf_counter() - start
+        return {
+            'frames': ticks,
+            'seconds': seconds,
+            'fps': ticks / seconds if seconds > 0 else float('inf'),
+            'level': self.level,
+            'score': self.score,
+            'game_over': self.game_over,
+            'death_cause': self.player.death_cause,
+        }
+
+# Dirty-rectangle rendering: only the regions touched by moving sprites and
+# HUD text are restored from the World layer and pushed to the display.
+# Used while playing at 1:1 scale; menus, level changes and scaled windows
+# fall back to a full redraw.
+DIRTY_RECTS = os.environ.get('CARTOFIA_DIRTY_RECTS', '0') == '1'
+# Record the session's input to this replay file, or play one back instead
+# of reading the keyboard (see Replay)
+RECORD_PATH = os.environ.get('CARTOFIA_RECORD')
+REPLAY_PATH = os.environ.get('CARTOFIA_REPLAY')
+# Time each phase of the frame and show rolling percentiles in the corner
+# (F3 toggles it at runtime); on by default in the browser build
+PROFILE = os.environ.get('CARTOFIA_PROFILE', '1' if IS_WEB else '0') == '1'
+PROFILE_REFRESH = 30  # frames between overlay text updates
+
+def asset_manifest(level):
+    """utils.AssetLoader entries for a Game starting on `level`: the 'level' group
+    is what playing it needs, decoded before the first frame; 'rest' streams in
+    while it is played (until then, sounds are skipped)."""
+    sprites = {'blob': Enemy, 'platform': Platform, 'lava': Lava, 'coin': Coin, 'exit': Exit}
+    manifest = [('level', 'background', background),
+                ('level', 'tiles', tile_images),
+                ('level', 'player', Player.load_frames),
+                ('level', 'buttons', button_images)]
+    # the class attribute is the SharedImage every instance draws
+    manifest.extend(('level', name, lambda cls=cls: cls.image) for name, cls in sprites.items())
+    # the grid and its baked layer, into the level cache that build_world reads
+    manifest.append(('level', f'level{level}', lambda: level_cache.get(level)))
+    manifest.append(('rest', 'audio', load_audio))
+    return manifest
+
+def _merge_rects(rects):
+    """Union overlapping rects so no region is repainted twice in one frame."""
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        i = 0
+        while i < len(merged):
+            if merged[i].colliderect(rect):
+                rect.union_ip(merged.pop(i))
+                i = 0
+            else:
+                i += 1
+        merged.append(rect)
+    return merged
+
+def frame_ticks(alpha, elapsed):
+    """The fixed-timestep accumulator, for a frame `elapsed` seconds after the
+    last one, which left `alpha` of a tick over: returns (ticks to run, alpha
+    to draw at and carry into the next frame). Stalls count as MAX_FRAME_TIME
+    and at most MAX_TICKS_PER_FRAME ticks run; a backlog beyond that is
+    dropped (the game slows down instead of spiralling)."""
+    pending = alpha + min(elapsed, MAX_FRAME_TIME) / SIM_DT
+    ticks = min(int(pending), MAX_TICKS_PER_FRAME)
+    pending -= ticks
+    if pending >= 1:
+        pending %= 1
+    return ticks, pending
+
+class Game:
+    def __init__(self, dirty_rects=None, headless=None, level=1, main_menu=None, record=None, replay=None, profile=None,
+                 preload=False):
+        self.headless = HEADLESS if headless is None else headless
+        init(self.headless)
+        replay = replay or REPLAY_PATH
+        if isinstance(replay, str):
+            replay = Replay.load(replay)
+        self.replay = replay
+        if replay is not None:
+            level = replay.level
             main_menu = False
+        self._playback = replay.masks() if replay is not None else None
+        self.record_path = record or RECORD_PATH
+        self.recording = Replay(level) if self.record_path else None
+        # with preload, run() decodes the level's assets in the background
+        # behind a progress screen, then makes the state (player, HUD coin,
+        # World) and the buttons: until then nothing is decoded up front
+        self.loader = None
+        self._preload_level = None
+        if preload and not self.headless:
+            self.loader = utils.AssetLoader(asset_manifest(level))
+            self._preload_level = level
+            self.state = None
+        else:
+            load_audio(self.headless)
+            self.state = GameState(level, self.headless)
+            self._make_buttons()
+        # Start menu only on desktop; web jumps straight in (avoids hit-test
+        # quirks), and so does a headless run
+        if main_menu is None:
+            main_menu = not IS_WEB
+        self.main_menu = main_menu and not IS_WEB and not self.headless
+        self.dirty_rects = DIRTY_RECTS if dirty_rects is None else dirty_rects
+        self.frame = 0
+        self._dirty = []          # rects drawn last frame, erased at the start of this one
+        self._drawn_world = None  # World whose layer is currently on game_surface
+        self._redraw = False      # sprites jumped (restart): next frame is a full redraw
+        self._presented = None    # present_rect of the last frame
+        self.camera = pygame.Rect(0, 0, GW, GH)  # the part of a scrolling level on screen
+        self.profiler = None
+        self._profile_overlay = None
+        self.set_profiling(PROFILE if profile is None else profile)
+
+    def set_profiling(self, enabled):
+        """Start (with empty stats) or stop the frame profiler; see profile_stats()."""
+        self.profiler = profiler.FrameProfiler() if enabled else None
+        if self.state is not None:
+            self.state.profiler = self.profiler
+        self._profile_overlay = None
+        self._redraw = True  # repaint whatever the overlay covered
+
+    def _make_buttons(self):
+        restart, start, exit_ = button_images()
+        self.restart_button = Button(GW // 2 - 50, GH // 2 + 100, restart)
+        self.start_button = Button(GW // 2 - 350, GH // 2, start)
+        self.exit_button = Button(GW // 2 + 150, GH // 2, exit_)
+
+    def profile_stats(self):
+        """Rolling per-phase frame timings in ms (FrameProfiler.stats), or {} when off."""
+        return self.profiler.stats() if self.profiler else {}
+
+    def _draw_profile(self):
+        """Blit the profiler overlay onto the display; returns its rect."""
+        prof = self.profiler
+        if self._profile_overlay is None or prof.frames % PROFILE_REFRESH == 0:
+            stats = prof.stats()
+            frame = stats.pop('frame', None)
+            dbg_font = utils.default_font(18)
+            lines = [f"frame {self.frame} lvl {self.state.level} go {self.state.game_over}"]
+            if frame:
+                lines.append(f"{'total':<8}{frame['p50']:6.2f}{frame['p95']:6.2f}{frame['p99']:6.2f} ms")
+            lines.extend(f"{phase:<8}{s['p50']:6.2f}{s['p95']:6.2f}{s['p99']:6.2f}" for phase, s in stats.items())
+            images = [dbg_font.render(line, True, white) for line in lines]
+            surface = pygame.Surface((max(img.get_width() for img in images) + 12,
+                                      sum(img.get_height() for img in images) + 8))
+            y = 4
+            for img in images:
+                surface.blit(img, (6, y))
+                y += img.get_height()
+            if self._profile_overlay is not None:
+                # never shrink, so the previous text is fully covered
+                old = self._profile_overlay
+                grown = pygame.Surface((max(old.get_width(), surface.get_width()),
+                                        max(old.get_height(), surface.get_height())))
+                grown.blit(surface, (0, 0))
+                surface = grown
+            self._profile_overlay = surface
+        return screen.blit(self._profile_overlay, (10, 10))
+
+    def _use_dirty_rects(self):
+        return (self.dirty_rects and not self.main_menu and self.state.world.background is not None
+                and self.state.world.chunks is None and present_rect.size == (GW, GH))
+
+    def _scene_rects(self, alpha=1.0):
+        """Rects the next _draw_scene() call will paint outside the static layer."""
+        state = self.state
+        hud = utils.render_text(font_score, "X " + str(state.score), white)
+        rects = [hud.get_rect(topleft=(tile_size - 10, 10))]
+        for group in (state.blob_group, state.platform_group):
+            rects.extend(pygame.Rect(lerp_pos(sprite, alpha), sprite.rect.size) for sprite in group)
+        rects.extend(state.player.draw_rects(state.game_over, alpha))
+        return rects
+
+    def _follow(self, alpha=1.0):
+        """Centre the camera on the player, inside the level; fixed for levels that fit the screen."""
+        world = self.state.world
+        camera = self.camera
+        if world.chunks is None:
+            camera.topleft = (0, 0)
+            return
+        player = self.state.player
+        x, y = lerp_pos(player, alpha)
+        camera.center = (x + player.rect.width // 2, y + player.rect.height // 2)
+        camera.clamp_ip(pygame.Rect((0, 0), world.size))
+
+    def _draw_scrolled(self, alpha=1.0):
+        """_draw_scene for a scrolling level: only what the camera sees."""
+        state = self.state
+        world = state.world
+        view = self.camera
+        ox, oy = view.topleft
+        world.draw(view)
+        # patrols are drawn up to a tick behind their rects
+        near = view.inflate(PATROL_SPEED * 2, PATROL_SPEED * 2)
+        for hashed in (world.blob_hash, world.platform_hash):
+            for sprite in hashed.collide(near):
+                x, y = lerp_pos(sprite, alpha)
+                DRAW_SURFACE.blit(sprite.image, (x - ox, y - oy))
+        score_coin = state.score_coin
+        for hashed in (world.lava_hash, world.coin_hash, world.exit_hash):
+            for sprite in hashed.collide(view):
+                if sprite is not score_coin:
+                    DRAW_SURFACE.blit(sprite.image, sprite.rect.move(-ox, -oy))
+        # the HUD stays put
+        if score_coin.alive():
+            DRAW_SURFACE.blit(score_coin.image, score_coin.rect)
+        utils.draw_text(DRAW_SURFACE, "X " + str(state.score), font_score, white, tile_size - 10, 10)
+        state.player.draw(DRAW_SURFACE, state.game_over, alpha, (ox, oy))
+
+    def _draw_scene(self, clip=None, alpha=1.0):
+        """Draw the world, HUD, sprites and player; with `clip`, only inside that rect."""
+        state = self.state
+        world = state.world
+        if world.chunks is not None:
+            self._draw_scrolled(alpha)
+            return
+        if clip is None:
+            world.draw()
+        else:
+            DRAW_SURFACE.set_clip(clip)
+            DRAW_SURFACE.blit(world.layer, clip, clip)
+        utils.draw_text(DRAW_SURFACE, "X " + str(state.score), font_score, white, tile_size - 10, 10)
+        # moving sprites are drawn between their last two tick positions
+        for group in (state.blob_group, state.platform_group):
+            for sprite in group:
+                DRAW_SURFACE.blit(sprite.image, lerp_pos(sprite, alpha))
+        if clip is None:
+            state.lava_group.draw(DRAW_SURFACE)
+            state.coin_group.draw(DRAW_SURFACE)
+            state.exit_group.draw(DRAW_SURFACE)
+        else:
+            for hashed in (world.lava_hash, world.coin_hash, world.exit_hash):
+                for sprite in hashed.collide(clip):
+                    DRAW_SURFACE.blit(sprite.image, sprite.rect)
+        state.player.draw(DRAW_SURFACE, state.game_over, alpha)
+        DRAW_SURFACE.set_clip(None)
+
+    def tick(self, keys=None):
+        """One logic tick of this game's state (see GameState.tick)."""
+        return self.state.tick(keys)
+
+    def _next_keys(self):
+        """Key state for the next tick: the replay's, else the keyboard's (recorded if asked)."""
+        if self._playback is not None:
+            mask = next(self._playback, 0)
+            if mask & KEY_RESTART:
+                self._restart()
+            keys = MASK_KEYS[mask & 7]
+        else:
+            keys = pygame.key.get_pressed()
+        if self.recording is not None:
+            self.recording.record(keys)
+        return keys
+
+    def _restart(self):
+        self.state.press_restart()
+        self._redraw = True
+        if self.recording is not None:
+            self.recording.restart_pending = True
+
+    def simulate(self, frames, inputs=None, advance=True):
+        """Run up to `frames` logic ticks without drawing (see GameState.simulate)."""
+        return self.state.simulate(frames, inputs, advance)
+
+    def step(self, ticks=1, alpha=1.0):
+        """Run `ticks` logic ticks, then draw one frame `alpha` of the way into
+        the next tick. Returns False once the game should quit."""
+        global DRAW_SURFACE
+        state = self.state
+        run = True
+        frame = self.frame
+        update_scaling()
+        DRAW_SURFACE = game_surface
+        if frame < 3:
+            print(f"[cartofia] frame {frame} screen_size={screen.get_size()} scale=({scale_x:.2f},{scale_y:.2f}) game_over={state.game_over} level={state.level}")
+        self.frame += 1
+        prof = self.profiler
+        if prof:
+            prof.lap('wait')  # since the last frame: the frame limiter and the loop
+
+        collected = []
+        if not self.main_menu:
+            for _ in range(ticks):
+                keys = self._next_keys()
+                if prof:
+                    prof.lap('input')
+                collected.extend(state.tick(keys))
+                if state.game_over == 1 and not state.advance_level():
+                    break
+                if prof:
+                    prof.lap('level')
+
+        # a moved or resized present_rect (update_scaling cleared the bars) needs a full frame
+        dirty = (self._use_dirty_rects() and self._drawn_world is state.world and not self._redraw
+                 and present_rect == self._presented)
+        self._redraw = False
+        self._presented = present_rect.copy()
+        updated = []  # regions that must reach the display this frame (dirty mode)
+        drawn = []    # regions this frame painted over the static layer
+        if self.main_menu or not state.world.background:
+            for img, pos in background():
+                DRAW_SURFACE.blit(img, pos)
+
+        if self.main_menu:
+            if self.exit_button.draw():
+                run = False
+            if self.start_button.draw():
+                self.main_menu = False
+        else:
+            self._follow(alpha)
+            if state.world.chunks is None:
+                state.world.sync_patrols()
+                drawn = [pygame.Rect(rect) for rect in self._scene_rects(alpha)]
+            if dirty:
+                # repaint last frame's rects, the collected coins and this
+                # frame's rects, each in full-redraw order
+                updated = _merge_rects(self._dirty + [coin.rect for coin in collected] + drawn)
+                for rect in updated:
+                    self._draw_scene(rect, alpha)
+            else:
+                self._draw_scene(alpha=alpha)
+            if prof:
+                prof.lap('draw')
+
+            # drawn on top of the scene
+            overlay = []
+            restart_button = self.restart_button
+            if state.game_over == 1:
+                # only still set after the last level
+                overlay.append(utils.draw_text(DRAW_SURFACE, "YOU WIN!", font, blue, GW // 2, GH // 2, center=True))
+            if state.game_over != 0:
+                overlay.append(restart_button.rect.copy())
+                if restart_button.draw() and self._playback is None:
+                    self._restart()
+            drawn.extend(overlay)
+            updated.extend(overlay)
+            if prof:
+                prof.lap('overlay')
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                run = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    run = False
+                elif event.key == pygame.K_F11:
+                    pygame.display.toggle_fullscreen()
+                elif event.key == pygame.K_F10:
+                    # cycle smooth -> nearest -> integer scaling
+                    next_mode = PRESENT_MODES[(PRESENT_MODES.index(present_mode) + 1) % len(PRESENT_MODES)]
+                    set_present_mode(next_mode)
+                elif event.key == pygame.K_F3:
+                    self.set_profiling(self.profiler is None)
+        if prof:
+            prof.lap('events')
+
+        if dirty:
+            # game_surface sits at present_rect's offset when integer scaling letterboxes it
+            offset = present_rect.topleft
+            updated = [screen.blit(game_surface, rect.move(offset), rect) for rect in updated]
+        else:
+            # Scale the logical game surface into the visible display
+            present()
+        if prof:
+            prof.lap('present')
+            if prof is self.profiler:  # not just switched off by F3
+                updated.append(self._draw_profile())
+        if dirty:
+            pygame.display.update(updated)
+        else:
+            pygame.display.flip()
+        if prof:
+            prof.lap('flip')
+            prof.end_frame()
+
+        # the next frame may only erase incrementally if this one left the
+        # current world's layer on game_surface
+        self._dirty = drawn
+        self._drawn_world = None if self.main_menu else state.world
+        return run
+
+    def _draw_progress(self, fraction):
+        """The loading screen: a progress bar over a plain backdrop."""
+        game_surface.fill((20, 24, 40))
+        bar = pygame.Rect(0, 0, GW // 2, 24)
+        bar.center = (GW // 2, GH // 2 + 40)
+        utils.draw_text(game_surface, f"Loading... {int(fraction * 100)}%", font_score, white,
+                        GW // 2, GH // 2 - 10, center=True)
+        pygame.draw.rect(game_surface, white, bar, 2)
+        pygame.draw.rect(game_surface, white, (bar.x, bar.y, round(bar.width * fraction), bar.height))
+        present()
+        pygame.display.flip()
+
+    async def _preload(self):
+        """Show the loading screen until the 'level' assets are in, then build the
+        level; the rest keeps loading (run_pending in the game loop on web).
+        Returns False if the window was closed meanwhile."""
+        import asyncio
+        loader = self.loader
+        loader.start()
+        while not loader.ready('level'):
+            loader.run_pending()
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    return False
+            update_scaling()
+            self._draw_progress(loader.progress('level'))
+            clock.tick(30)
+            await asyncio.sleep(0)  # WEB: let the browser paint the progress
+        self.state = GameState(self._preload_level, self.headless)
+        self.state.profiler = self.profiler
+        self._make_buttons()
+        return True
 
     async def run(self):
-        global level, score, world, game_over, main_menu, DRAW_SURFACE
-        run = True
-        frame = 0
+        import asyncio  # only the game loop needs it; keeps `import main` cheap
         print("[cartofia] Game.run start")
-        # main game loop
+        if self.headless and self.replay is not None:
+            start = time.perf_counter()
+            state = self.replay.play(self.state)
+            print(f"[cartofia] replay: {self.replay.ticks} ticks in {time.perf_counter() - start:.3f}s "
+                  f"level={state.level} score={state.score} game_over={state.game_over} "
+                  f"(recorded: {self.replay.result})")
+            pygame.quit()
+            return
+        if self.headless:
+            script = os.environ.get('CARTOFIA_SCRIPT')
+            inputs = ScriptedInput.load(script) if script else None
+            result = self.simulate(int(os.environ.get('CARTOFIA_FRAMES', '3600')), inputs)
+            print("[cartofia] headless run: {frames} frames in {seconds:.3f}s ({fps:.0f} fps) "
+                  "level={level} score={score} game_over={game_over}".format(**result))
+            pygame.quit()
+            return
+        if self.loader is not None and not await self._preload():
+            pygame.quit()
+            return
+        # main game loop: fixed logic ticks from an accumulator, one render per loop
+        alpha = 0.0
+        last = time.perf_counter()
         try:
-            while run:
+            while True:
                 clock.tick(fps)
-                update_scaling()
-                DRAW_SURFACE = game_surface
-                if IS_WEB:
-                    # WEB: keep menu disabled in case globals were modified
-                    main_menu = False
-                if frame < 3:
-                    print(f"[cartofia] frame {frame} screen_size={screen.get_size()} scale=({scale_x:.2f},{scale_y:.2f}) game_over={game_over} level={level}")
-                frame += 1
-                DRAW_SURFACE.blit(bg_img, (0, 0))
-                DRAW_SURFACE.blit(sun_img, (290, 150))
-
-                if main_menu:
-                    if exit_button.draw():
-                        run = False
-                    if start_button.draw():
-                        main_menu = False
-                else:
-                    world.draw()
-                    if game_over == 0:
-                        blob_group.update()
-                        platform_group.update()
-                    if pygame.sprite.spritecollide(cast(Any, player), coin_group, True):
-                        score += 1
-                        if coin_fx:
-                            coin_fx.play()
-                    utils.draw_text(DRAW_SURFACE, "X " + str(score), font_score, white, tile_size - 10, 10)
-                    blob_group.draw(DRAW_SURFACE)
-                    platform_group.draw(DRAW_SURFACE)
-                    lava_group.draw(DRAW_SURFACE)
-                    coin_group.draw(DRAW_SURFACE)
-                    exit_group.draw(DRAW_SURFACE)
-                    game_over = player.update(game_over)
-
-                    if game_over == -1:
-                        if restart_button.draw():
-                            world = reset_level(level)
-                            game_over = 0
-                            score = 0
-                    if game_over == 1:
-                        level += 1
-                        if level <= max_levels:
-                            world = reset_level(level)
-                            game_over = 0
-                        else:
-                            utils.draw_text(DRAW_SURFACE, "YOU WIN!", font, blue, GW // 2, GH // 2, center=True)
-                            if restart_button.draw():
-                                level = 1
-                                world = reset_level(level)
-                                game_over = 0
-                                score = 0
-
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        run = False
-                    elif event.type == pygame.KEYDOWN:
-                        if event.key == pygame.K_ESCAPE:
-                            run = False
-                        elif event.key == pygame.K_F11:
-                            pygame.display.toggle_fullscreen()
-
-                # Scale the logical game surface into the visible display
-                scaled_surface = pygame.transform.smoothscale(game_surface, (screen_width, screen_height))
-                if IS_WEB:
-                    # draw a persistent debug overlay to confirm rendering in browser
-                    pygame.draw.rect(scaled_surface, (255, 0, 0), (10, 10, 240, 50))
-                    dbg_font = pygame.font.SysFont(None, 24)
-                    txt = dbg_font.render(f"WEB frame {frame} lvl {level} go {game_over}", True, (255, 255, 255))
-                    scaled_surface.blit(txt, (20, 20))
-                screen.blit(scaled_surface, (0, 0))
-                pygame.display.flip()
+                now = time.perf_counter()
+                ticks, alpha = frame_ticks(alpha, now - last)
+                last = now
+                if not self.step(ticks, alpha):
+                    break
+                level_cache.run_pending()  # prefetch work where threads aren't available
+                if self.loader is not None:
+                    self.loader.run_pending()
                 if IS_WEB:
                     await asyncio.sleep(0)  # WEB: yield to browser so events/flips stay responsive
         except Exception as e:
@@ -555,13 +1612,17 @@ class Game:
             traceback.print_exc()
 
         # End of game loop (while run)
+        if self.recording is not None:
+            self.recording.save(self.record_path, self.state)
+            print(f"[cartofia] recorded {self.recording.ticks} ticks to {self.record_path}")
         pygame.quit()
         await asyncio.sleep(0)  # yield to browser
 
 async def main():
-    game = Game()
+    game = Game(preload=True)
     await game.run()
 
 if __name__ == "__main__":
+    import asyncio
     # Call main() for both desktop and web; pygbag intercepts asyncio on web.
     asyncio.run(main())
@@ -0,0 +1,95 @@
+"""NumPy structure-of-arrays backend for the patrolling sprites.
+
+PatrolArrays holds the positions, directions and counters of a group of
+Enemy/Platform sprites in arrays and advances them all with a few vectorised
+operations per tick, doing the same arithmetic as their update() methods. It
+stands in for the group's SpatialHash: collide() and query() test the arrays
+directly, and only the sprites they return get their rect (and prev_pos,
+move_direction, move_counter) written back. Code that reads every sprite
+calls sync() first.
+
+Needs NumPy, which the game itself does not (see GameState's numpy_patrols).
+"""
+import numpy as np
+
+
+class PatrolArrays:
+    def __init__(self, sprites, turn):
+        self.sprites = list(sprites)
+        self.turn = turn  # ticks each way before turning round
+        n = len(self.sprites)
+        self.x = np.zeros(n, np.int32)
+        self.y = np.zeros(n, np.int32)
+        self.prev_x = np.zeros(n, np.int32)
+        self.prev_y = np.zeros(n, np.int32)
+        self.w = np.array([sprite.rect.width for sprite in self.sprites], np.int32)
+        self.h = np.array([sprite.rect.height for sprite in self.sprites], np.int32)
+        # enemies walk along x; platforms move along x or y
+        self.move_x = np.array([getattr(sprite, 'move_x', 1) for sprite in self.sprites], np.int32)
+        self.move_y = np.array([getattr(sprite, 'move_y', 0) for sprite in self.sprites], np.int32)
+        self.direction = np.zeros(n, np.int32)
+        self.counter = np.zeros(n, np.int32)
+        self.refresh()
+
+    def __len__(self):
+        return len(self.sprites)
+
+    def refresh(self):
+        """Re-read every sprite's state into the arrays (after restart())."""
+        sprites = self.sprites
+        self.x[:] = [sprite.rect.x for sprite in sprites]
+        self.y[:] = [sprite.rect.y for sprite in sprites]
+        self.prev_x[:] = [sprite.prev_pos[0] for sprite in sprites]
+        self.prev_y[:] = [sprite.prev_pos[1] for sprite in sprites]
+        self.direction[:] = [sprite.move_direction for sprite in sprites]
+        self.counter[:] = [sprite.move_counter for sprite in sprites]
+
+    def step(self, move=True):
+        """One tick: the current positions become prev_pos; with `move`, every
+        sprite takes its step and those at the end of their run turn round."""
+        self.prev_x[:] = self.x
+        self.prev_y[:] = self.y
+        if not move or not self.sprites:
+            return
+        direction = self.direction
+        self.x += direction * self.move_x
+        self.y += direction * self.move_y
+        counter = self.counter
+        counter += 1
+        # turning round flips both signs: multiply by -1 where |counter| > turn
+        flip = 1 - 2 * (np.abs(counter) > self.turn).astype(np.int32)
+        direction *= flip
+        counter *= flip
+
+    def moved(self, distance):
+        """SpatialHash interface: nothing to re-file, queries read the arrays."""
+
+    def _sync(self, indices):
+        sprites = self.sprites
+        rows = zip(indices.tolist(), self.x[indices].tolist(), self.y[indices].tolist(),
+                   self.prev_x[indices].tolist(), self.prev_y[indices].tolist(),
+                   self.direction[indices].tolist(), self.counter[indices].tolist())
+        found = []
+        for i, x, y, prev_x, prev_y, direction, counter in rows:
+            sprite = sprites[i]
+            sprite.rect.topleft = (x, y)
+            sprite.prev_pos = (prev_x, prev_y)
+            sprite.move_direction = direction
+            sprite.move_counter = counter
+            found.append(sprite)
+        return found
+
+    def sync(self):
+        """Write every sprite's state back from the arrays."""
+        self._sync(np.arange(len(self.sprites)))
+
+    def collide(self, rect):
+        """Synced sprites whose rect overlaps `rect`, in group order."""
+        x = self.x
+        y = self.y
+        hits = np.flatnonzero((x < rect.right) & (x + self.w > rect.left) &
+                              (y < rect.bottom) & (y + self.h > rect.top))
+        return self._sync(hits) if len(hits) else []
+
+    # exact, so the candidates are the colliding sprites themselves
+    query = collide
@@ -0,0 +1,73 @@
+"""Per-phase frame timings for the game loop.
+
+The loop calls lap(phase) after each piece of work; the time since the
+previous lap is charged to that phase (several laps of one phase in a frame
+add up), and end_frame() files the frame's totals into a fixed-size ring of
+recent frames per phase. stats() gives rolling percentiles from those rings,
+so code (benchmarks, tests) reads the same numbers the overlay shows.
+"""
+from array import array
+from time import perf_counter_ns
+
+PERCENTILES = (50, 95, 99)
+
+
+def _summary(values):
+    """p50/p95/p99 (nearest rank) and mean of ns samples, in ms."""
+    if not values:
+        return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'mean': 0.0}
+    values = sorted(values)
+    last = len(values) - 1
+    result = {f'p{p}': values[min(last, -(-p * len(values) // 100) - 1)] / 1e6 for p in PERCENTILES}
+    result['mean'] = sum(values) / len(values) / 1e6
+    return result
+
+
+class FrameProfiler:
+    def __init__(self, size=240):
+        self.size = size      # frames kept per phase
+        self.frames = 0       # frames ended so far
+        self.rings = {}       # phase -> array of ns per frame, indexed frame % size
+        self.current = {}     # phase -> ns so far this frame
+        self._mark = perf_counter_ns()
+
+    def mark(self):
+        """Start timing from now (the next lap is measured from here)."""
+        self._mark = perf_counter_ns()
+
+    def lap(self, phase):
+        now = perf_counter_ns()
+        self.current[phase] = self.current.get(phase, 0) + now - self._mark
+        self._mark = now
+
+    def end_frame(self):
+        slot = self.frames % self.size
+        current = self.current
+        for phase in current:
+            if phase not in self.rings:
+                self.rings[phase] = array('q', bytes(8 * self.size))
+        for phase, ring in self.rings.items():
+            ring[slot] = current.get(phase, 0)
+        current.clear()
+        self.frames += 1
+
+    def samples(self, phase):
+        """The phase's ns per frame over the window (unordered)."""
+        ring = self.rings.get(phase)
+        if ring is None:
+            return []
+        return list(ring[:min(self.frames, self.size)])
+
+    def stats(self):
+        """{phase: {'p50', 'p95', 'p99', 'mean'}} in ms over the window; 'frame' is all phases summed."""
+        window = min(self.frames, self.size)
+        result = {}
+        totals = [0] * window
+        for phase, ring in self.rings.items():
+            values = ring[:window]
+            for i, ns in enumerate(values):
+                totals[i] += ns
+            result[phase] = _summary(values)
+        if self.rings:
+            result['frame'] = _summary(totals)
+        return result
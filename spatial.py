@@ -0,0 +1,106 @@
+"""Uniform-grid spatial hash used as the collision broad phase.
+
+Sprites are filed under every grid cell their rect overlaps, so a query only
+looks at the sprites near the queried rect instead of scanning a whole group.
+Static sprites (lava, coins, exits) are filed once. For moving ones (enemies,
+platforms) the caller reports how far they may have moved each tick with
+moved(); queries widen by that slack, and the sprites are re-filed once it
+reaches half a cell, so a tick does not have to touch every moving sprite.
+"""
+
+
+class SpatialHash:
+    def __init__(self, cell_size, sprites=()):
+        self.cell_size = cell_size
+        self.buckets = {}
+        self._cells = {}   # sprite -> (x0, y0, x1, y1) cell range it is filed under
+        self._order = {}   # sprite -> insertion index, so queries keep group order
+        self._next = 0
+        self.slack = 0     # how far any sprite may have moved since it was filed
+        for sprite in sprites:
+            self.add(sprite)
+
+    def __len__(self):
+        return len(self._cells)
+
+    def __contains__(self, sprite):
+        return sprite in self._cells
+
+    def _range(self, rect):
+        size = self.cell_size
+        return (rect.left // size, rect.top // size,
+                (rect.right - 1) // size, (rect.bottom - 1) // size)
+
+    def _file(self, sprite, cells):
+        self._cells[sprite] = cells
+        x0, y0, x1, y1 = cells
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = self.buckets.get((cx, cy))
+                if bucket is None:
+                    self.buckets[(cx, cy)] = [sprite]
+                else:
+                    bucket.append(sprite)
+
+    def _unfile(self, sprite):
+        x0, y0, x1, y1 = self._cells[sprite]
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = self.buckets[(cx, cy)]
+                bucket.remove(sprite)
+                if not bucket:
+                    del self.buckets[(cx, cy)]
+
+    def add(self, sprite):
+        if sprite in self._cells:
+            return
+        self._order[sprite] = self._next
+        self._next += 1
+        self._file(sprite, self._range(sprite.rect))
+
+    def remove(self, sprite):
+        if sprite not in self._cells:
+            return
+        self._unfile(sprite)
+        del self._cells[sprite]
+        del self._order[sprite]
+
+    def clear(self):
+        self.buckets.clear()
+        self._cells.clear()
+        self._order.clear()
+
+    def refresh(self):
+        """Re-file the sprites whose rect has moved into a different cell range."""
+        moved = [(sprite, cells) for sprite, cells in self._cells.items()
+                 if self._range(sprite.rect) != cells]
+        for sprite, cells in moved:
+            self._unfile(sprite)
+            self._file(sprite, self._range(sprite.rect))
+        self.slack = 0
+
+    def moved(self, distance):
+        """Record that every sprite may have moved up to `distance` pixels."""
+        self.slack += distance
+        if self.slack * 2 >= self.cell_size:
+            self.refresh()
+
+    def query(self, rect):
+        """Candidates for `rect`: sprites filed in any cell it overlaps, in insertion order."""
+        if self.slack:
+            rect = rect.inflate(self.slack * 2, self.slack * 2)
+        x0, y0, x1, y1 = self._range(rect)
+        buckets = self.buckets
+        found = set()
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = buckets.get((cx, cy))
+                if bucket:
+                    found.update(bucket)
+        if len(found) < 2:
+            return list(found)
+        return sorted(found, key=self._order.__getitem__)
+
+    def collide(self, rect):
+        """Sprites whose rect actually overlaps `rect` (like spritecollide)."""
+        return [sprite for sprite in self.query(rect) if sprite.rect.colliderect(rect)]
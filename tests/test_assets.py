@@ -0,0 +1,142 @@
+import configparser
+import json
+import os
+import shutil
+import threading
+import time
+
+import pygame
+import main
+import utils
+from tools import build_atlas
+
+pygame.init()
+
+
+def test_image_cache_shares_surfaces():
+    utils.evict_images()
+    first = utils.get_image('coin.png', size=(25, 25))
+    second = utils.get_image('coin.png', size=(25, 25))
+    assert first is second
+    assert first.get_size() == (25, 25)
+    # the unscaled decode is shared by every scaled variant
+    assert utils.get_image('coin.png') is utils.get_image('coin.png')
+
+    info = utils.image_cache_info()
+    assert info['misses'] == 2
+    assert info['hits'] == 3
+    assert info['entries'] == 2
+
+    assert utils.evict_images('coin.png') == 2
+    assert utils.image_cache_info()['entries'] == 0
+    assert utils.get_image('coin.png', size=(25, 25)) is not first
+
+
+def test_image_cache_fills_once_across_threads(monkeypatch):
+    utils.evict_images()
+    decodes = []
+    load_image = utils.load_image
+
+    def slow_load(name, alpha=True):
+        decodes.append(name)
+        time.sleep(0.01)  # widen the window for a second decode
+        return load_image(name, alpha)
+
+    monkeypatch.setattr(utils, 'load_image', slow_load)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(utils.get_image('lava.png', size=(50, 25))))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert decodes == ['lava.png']
+    assert len(results) == 8 and all(img is results[0] for img in results)
+
+
+def test_sprites_come_from_the_atlas():
+    utils.evict_images()
+    coin = utils.get_image('coin.png')
+    blob = utils.get_image('blob.png')
+    assert coin.get_parent() is not None and coin.get_parent() is blob.get_parent()
+    # same pixels as the separate file
+    original = pygame.image.load(os.path.join(utils.ASSET_DIR, 'coin.png'))
+    assert coin.get_size() == original.get_size()
+    for x in range(0, coin.get_width(), 7):
+        for y in range(0, coin.get_height(), 7):
+            if original.get_at((x, y)).a:
+                assert coin.get_at((x, y)) == original.get_at((x, y))
+    # backdrops are not packed
+    assert utils.atlas_image('sky.png') is None
+
+
+def test_edited_sprite_is_loaded_from_its_file(tmp_path, monkeypatch, capsys):
+    assets = utils.ASSET_DIR
+    for name in (utils.ATLAS_IMAGE, utils.ATLAS_INDEX, 'coin.png', 'blob.png'):
+        shutil.copy(os.path.join(assets, name), tmp_path / name)
+    monkeypatch.setattr(utils, 'ASSET_DIR', str(tmp_path))
+    monkeypatch.setattr(utils, '_atlas', None)
+    later = os.path.getmtime(tmp_path / utils.ATLAS_INDEX) + 10
+    # touched but unchanged (a fresh checkout): still the atlas
+    os.utime(tmp_path / 'coin.png', (later, later))
+    assert utils.load_image('coin.png').get_parent() is not None
+    # edited after the atlas was built: the file, with a warning
+    shutil.copy(os.path.join(assets, 'sun.png'), tmp_path / 'blob.png')
+    os.utime(tmp_path / 'blob.png', (later, later))
+    blob = utils.load_image('blob.png')
+    assert blob.get_parent() is None
+    assert blob.get_size() == pygame.image.load(tmp_path / 'blob.png').get_size()
+    assert 'build_atlas' in capsys.readouterr().out
+
+
+def test_packed_sprites_are_left_out_of_the_web_build():
+    config = configparser.ConfigParser()
+    config.read(build_atlas.WEB_CONFIG)
+    ignored = json.loads(config['DEPENDENCIES']['ignoreFiles'])
+    with open(os.path.join(utils.ASSET_DIR, utils.ATLAS_INDEX), encoding='utf-8') as f:
+        assert sorted(json.load(f)['sprites']) == ignored
+    assert utils.ATLAS_IMAGE not in ignored
+
+
+def test_atlas_packing_does_not_overlap():
+    sizes = {f'{n}.png': (10 + n * 7 % 40, 5 + n * 13 % 30) for n in range(30)}
+    rects, (width, height) = build_atlas.pack(sizes, padding=1)
+    boxes = [pygame.Rect(rect) for rect in rects.values()]
+    assert all(box.size == sizes[name] for name, box in zip(rects, boxes))
+    assert pygame.Rect(0, 0, width, height).unionall(boxes) == pygame.Rect(0, 0, width, height)
+    for i, box in enumerate(boxes):
+        assert box.collidelist(boxes[i + 1:]) == -1
+
+
+def test_player_frames_are_shared_and_follow_eviction(monkeypatch):
+    state = main.GameState(None, headless=True)
+    first = main.Player(100, 100, state)
+    second = main.Player(300, 100, state)
+    assert first.images_right is second.images_right
+    assert first.dead_image is second.dead_image
+
+    loads = []
+    get_image = utils.get_image
+    monkeypatch.setattr(utils, 'get_image', lambda *args, **kw: loads.append(args) or get_image(*args, **kw))
+    first.reset(100, 100)
+    assert loads == [] and first.images_left is second.images_left
+
+    frames = main.Player.load_frames()
+    utils.evict_images()
+    assert main.Player.load_frames() is not frames
+    first.reset(100, 100)
+    assert first.images_right is not frames[0] and first.images_right is main.Player.load_frames()[0]
+    assert loads  # decoded again
+
+
+def test_text_and_font_caches():
+    font = utils.default_font(30)
+    assert utils.default_font(30) is font
+
+    img = utils.render_text(font, 'X 3', (255, 255, 255))
+    assert utils.render_text(font, 'X 3', [255, 255, 255]) is img
+    assert utils.render_text(font, 'X 4', (255, 255, 255)) is not img
+
+    for n in range(utils.TEXT_CACHE_SIZE):
+        utils.render_text(font, str(n), (0, 0, 0))
+    assert utils.render_text(font, 'X 3', (255, 255, 255)) is not img
@@ -0,0 +1,19 @@
+import batch
+
+
+def timeless(results):
+    return sorted((sorted((k, v) for k, v in r.items() if k not in ('seconds', 'fps')) for r in results),
+                  key=repr)
+
+
+def test_pool_matches_in_process_run(tmp_path):
+    script = tmp_path / 'run.txt'
+    script.write_text('40 d\n12 d space\n30 d\n')
+    jobs = batch.make_jobs([2, 3, 8], scripts=[str(script)], seeds=range(4), max_frames=600)
+    local = list(batch.run_jobs(jobs, processes=1))
+    assert len(local) == len(jobs)
+    for result in local:
+        assert result['outcome'] in ('exit', 'died', 'timeout')
+        assert (result['death_cause'] is not None) == (result['outcome'] == 'died')
+        assert result['frames'] <= 600
+    assert timeless(batch.run_jobs(jobs, processes=2)) == timeless(local)
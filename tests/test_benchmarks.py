@@ -0,0 +1,26 @@
+from benchmarks import suite
+
+
+def test_synthetic_level_is_dense():
+    rows = suite.synthetic_level(40)
+    tiles = [tile for row in rows for tile in row]
+    assert len(rows) == 40 and all(len(row) == 40 for row in rows)
+    assert tiles.count(3) > 40 and tiles.count(7) > 40
+    assert tiles.count(8) == 1
+    assert suite.synthetic_level(40) == rows  # reproducible
+
+
+def test_quick_run_and_compare():
+    data = suite.run(quick=True, sizes=(20,), levels=(1,), log=lambda line: None)
+    results = data['results']
+    assert {'level1/world', 'level1/tick', 'level1/frame', 'gen20x20/player', 'gen20x20/load_lvl'} <= set(results)
+    assert all(ms > 0 for ms in results.values())
+
+    assert suite.compare(data, data, 0.25) == []
+    slower = {'results': {name: ms * 2 for name, ms in results.items()}}
+    regressions = suite.compare(slower, data, 0.25, min_delta=0)
+    assert len(regressions) == len(results)
+    # the threshold and the jitter floor both apply
+    assert suite.compare(slower, data, 2.0) == []
+    assert suite.compare({'results': {'level1/tick': results['level1/tick'] + 0.01}},
+                         {'results': {'level1/tick': results['level1/tick'] / 2}}, 0.25, min_delta=1) == []
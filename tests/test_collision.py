@@ -0,0 +1,37 @@
+import pygame
+import utils
+import main
+
+pygame.init()
+
+
+def scan_collide(world, rect, dx, dy, vel_y):
+    # the original Player.update loop over every tile in world.tile_list
+    in_air = True
+    for tile in world.tile_list:
+        if tile[1].colliderect(rect.x + dx, rect.y, rect.width, rect.height):
+            dx = 0
+        if tile[1].colliderect(rect.x, rect.y + dy, rect.width, rect.height):
+            if vel_y < 0:
+                dy = tile[1].bottom - rect.top
+                vel_y = 0
+            elif vel_y >= 0:
+                dy = tile[1].top - rect.bottom
+                vel_y = 0
+                in_air = False
+    return dx, dy, vel_y, in_air
+
+
+def test_grid_collision_matches_tile_scan():
+    moves = [(0, 1), (5, 10), (-5, 10), (5, -15), (-5, -15), (0, -10), (5, 0), (-5, 3)]
+    for level in range(1, main.max_levels + 1):
+        ld = utils.load_level_data(level)
+        world = main.World(ld)
+        for y in range(-100, main.GH + 20, 31):
+            for x in range(-60, main.GW + 20, 37):
+                rect = pygame.Rect(x, y, 40, 80)
+                for dx, vel_y in moves:
+                    dy = min(vel_y, 10)
+                    expected = scan_collide(world, rect, dx, dy, vel_y)
+                    got = world.collide_tiles(rect, dx, dy, vel_y)
+                    assert got == expected, (level, x, y, dx, dy, vel_y)
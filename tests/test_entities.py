@@ -0,0 +1,61 @@
+import tracemalloc
+
+import pygame
+import main
+import utils
+
+pygame.init()
+
+
+def test_entities_are_slotted_and_share_images():
+    coins = [main.Coin(100, 100), main.Coin(200, 100)]
+    assert coins[0].image is coins[1].image is main.Coin.image
+    assert coins[0].rect.center == (100, 100)
+    assert main.Enemy(0, 0).image is not coins[0].image
+
+    # a coin is its slots and its rect: no dict, set or surface of its own
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    coins = [main.Coin(x, 100) for x in range(1000)]
+    per_coin = (tracemalloc.get_traced_memory()[0] - before) / len(coins)
+    tracemalloc.stop()
+    assert per_coin < 200
+
+
+def test_shared_images_follow_eviction():
+    coin = main.Coin(100, 100)
+    image = coin.image
+    assert image is utils.get_image('coin.png', size=image.get_size())
+    assert main.Coin.image is image  # cached between evictions
+    utils.evict_images('coin.png')
+    assert coin.image is not image
+    assert coin.image is utils.get_image('coin.png', size=image.get_size())
+    blob = main.Enemy.image
+    utils.evict_images()
+    assert utils.image_cache_info()['entries'] == 0
+    assert main.Enemy.image is not blob and main.Coin.image is not image
+
+
+def test_entities_work_in_groups():
+    group = pygame.sprite.Group()
+    other = pygame.sprite.Group()
+    coin = main.Coin(100, 100)
+    assert not coin.alive()
+    group.add(coin)
+    other.add(coin)
+    group.add(coin)
+    assert coin in group and coin in other
+    assert len(group) == 1 and set(coin.groups()) == {group, other}
+
+    group.remove(coin)
+    assert coin not in group and coin.alive()
+    coin.kill()
+    assert not coin.alive() and len(other) == 0
+
+    group.add(coin)
+    group.empty()
+    assert not coin.alive()
+    group.add(coin)
+    surface = pygame.Surface((300, 300))
+    group.draw(surface)
+    assert surface.get_at(coin.rect.center) != (0, 0, 0, 255)
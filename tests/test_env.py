@@ -0,0 +1,103 @@
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import main  # noqa: E402
+import env  # noqa: E402
+from benchmarks import suite  # noqa: E402
+
+
+def actions(seed, count):
+    # biased to the right so episodes get somewhere (coins, enemies, lava)
+    rnd = random.Random(seed)
+    choices = [env.RIGHT, env.RIGHT | env.JUMP, env.RIGHT, env.LEFT, 0, env.JUMP]
+    return [rnd.choice(choices) for _ in range(count)]
+
+
+def test_env_steps_the_game_physics():
+    e = env.Env()
+    obs = e.reset(4)
+    tiles, player, entities = obs['tiles'], obs['player'], obs['entities']
+    assert tiles.shape == (20, 20) and not tiles.flags.owndata
+    assert tiles.tolist() == main.grid_cache.get(4)[0].to_lists()
+
+    # the same inputs through a plain GameState
+    state = main.GameState(4, headless=True)
+    total = 0.0
+    for action in actions(0, 1000):
+        obs, reward, done = e.step(action)
+        state.tick(env.ACTION_KEYS[action])
+        total += reward
+        assert obs['player'] is player and obs['entities'] is entities
+        assert tuple(player[:2]) == state.player.rect.topleft
+        moving = [row for row in entities if row[0] in (3, 4, 5)]
+        assert sorted((x, y) for _, x, y, _ in moving) == sorted(
+            s.rect.topleft for s in list(state.blob_group) + list(state.platform_group))
+        coins = [row for row in entities if row[0] == 7]
+        assert sum(alive for *_, alive in coins) == len(state.coin_group)
+        if done:
+            break
+    assert done and state.game_over != 0
+    assert total == player[4] * env.REWARD_COIN + (env.REWARD_EXIT if state.game_over == 1 else env.REWARD_DEATH)
+    with pytest.raises(RuntimeError):
+        e.step(0)
+
+
+def test_batch_matches_single_envs():
+    levels = [2, 3, 4, 8, 11]
+    batch = env.BatchEnv(len(levels), levels)
+    singles = [env.Env() for _ in levels]
+    batch.reset()
+    for e, level in zip(singles, levels):
+        e.reset(level)
+    moves = [actions(seed, 300) for seed in range(len(levels))]
+    for t in range(300):
+        obs, rewards, dones = batch.step([m[t] for m in moves])
+        for i, e in enumerate(singles):
+            single, reward, done = e.step(moves[i][t])
+            assert rewards[i] == reward and dones[i] == done
+            if done:
+                single = e.reset(levels[i])
+            assert (obs['player'][i] == single['player']).all()
+            rows = len(single['entities'])
+            assert (obs['entities'][i][:rows] == single['entities']).all()
+            assert not obs['entities'][i][rows:].any()  # padding to the densest level
+    assert (obs['tiles'][2] == singles[2].obs['tiles']).all()
+
+
+def test_reset_to_another_level_starts_from_zero():
+    e = env.Env()
+    e.reset(2)
+    state = e.state
+    coin = next(c for c in state.coin_group if c is not state.score_coin)
+    state.player.rect.midbottom = coin.rect.midtop
+    for _ in range(5):
+        obs, reward, done = e.step(0)
+        if reward:
+            break
+    assert reward == env.REWARD_COIN and obs['player'][4] == 1
+
+    obs = e.reset(3)
+    assert obs['player'][4] == 0 and e.state.score == 0
+    obs, reward, done = e.step(0)
+    assert reward == 0 and obs['player'][4] == 0
+
+
+def test_entity_rows_sized_to_the_level():
+    with suite.synthetic_levels((50,)) as numbers:
+        level = numbers[50]
+        grid = main.grid_cache.get(level)[0].to_lists()
+        dense = sum(tile in env.ENTITY_TILES for row in grid for tile in row) + 1
+        assert dense > 128
+
+        e = env.Env()
+        assert len(e.reset(level)['entities']) == dense
+        assert len(e.reset(1)['entities']) < dense
+        e.step(env.RIGHT)
+
+        batch = env.BatchEnv(2, [1, level])
+        obs = batch.reset()
+        assert obs['entities'].shape == (2, dense, 4)
+        batch.step([env.RIGHT, env.RIGHT])
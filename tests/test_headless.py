@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+
+import pygame
+import main
+
+pygame.init()
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = """
+# run right, hop, then idle
+40 d
+12 d space
+30 d
+20 a
+5
+"""
+
+
+def test_scripted_input_steps():
+    inputs = main.ScriptedInput.parse("2 d\n1 d space\n1")
+    keys = [inputs.next() for _ in range(5)]
+    assert [k[pygame.K_d] for k in keys] == [True, True, True, False, False]
+    assert [k[pygame.K_SPACE] for k in keys] == [False, False, True, False, False]
+
+
+def simulate(level):
+    game = main.Game(headless=True, level=level)
+    return game.simulate(600, main.ScriptedInput.parse(SCRIPT, loop=True)), game.state
+
+
+def test_simulation_is_repeatable():
+    first, _ = simulate(3)
+    second, state = simulate(3)
+    assert first['frames'] > 0
+    for field in ('frames', 'level', 'score', 'game_over'):
+        assert first[field] == second[field]
+    assert (state.player.rect.x, state.player.rect.y) != (100, main.GH - 130)
+
+
+def test_interleaved_states_are_independent():
+    levels = [2, 3, 4, 8] * 3
+    solo = []
+    for level in levels:
+        state = main.GameState(level, headless=True)
+        state.simulate(300, main.ScriptedInput.parse(SCRIPT, loop=True))
+        solo.append((state.level, state.score, state.game_over, state.player.rect.topleft))
+
+    # the same runs stepped one tick at a time, round robin, in one process
+    states = [main.GameState(level, headless=True) for level in levels]
+    inputs = [main.ScriptedInput.parse(SCRIPT, loop=True) for _ in levels]
+    done = [False] * len(states)
+    for _ in range(300):
+        for i, state in enumerate(states):
+            if not done[i]:
+                state.tick(inputs[i].next())
+                done[i] = state.game_over == -1 or (state.game_over == 1 and not state.advance_level())
+    assert [(s.level, s.score, s.game_over, s.player.rect.topleft) for s in states] == solo
+
+
+HEADLESS_GAME = """
+import os, pygame, main
+pygame.init()
+game = main.Game(headless=True, level=2)
+assert game.headless and game.state.headless
+assert pygame.display.get_driver() == 'dummy'
+assert os.environ['SDL_AUDIODRIVER'] == 'dummy'
+assert not pygame.mixer.music.get_busy()
+"""
+
+
+def test_headless_argument_uses_dummy_drivers():
+    # fresh interpreter without CARTOFIA_HEADLESS or SDL driver settings
+    environ = {key: value for key, value in os.environ.items()
+               if not key.startswith(('SDL_', 'CARTOFIA_'))}
+    subprocess.run([sys.executable, '-c', HEADLESS_GAME], cwd=ROOT, env=environ, check=True)
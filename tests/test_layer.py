@@ -0,0 +1,62 @@
+import pygame
+import utils
+import main
+
+pygame.init()
+
+
+def per_tile_frame(world, backdrop=()):
+    # the original per-frame drawing: backdrop, then every tile in tile_list
+    surface = pygame.Surface((main.GW, main.GH), 0, main.game_surface)
+    for img, pos in backdrop:
+        surface.blit(img, pos)
+    for img, rect in world.tile_list:
+        surface.blit(img, rect)
+    return pygame.image.tobytes(surface, 'RGB')
+
+
+def baked_frame(world, backdrop=()):
+    surface = pygame.Surface((main.GW, main.GH), 0, main.game_surface)
+    for img, pos in backdrop:
+        surface.blit(img, pos)
+    surface.blit(world.layer, (0, 0))
+    return pygame.image.tobytes(surface, 'RGB')
+
+
+def test_baked_layer_matches_per_tile_blits():
+    main.init()
+    for level in (1, 4, 9):
+        data = utils.load_level_data(level)
+        # with a backdrop, the layer is opaque and has the backdrop in it
+        world = main.World(data, main.background())
+        assert world.layer.get_size() == (main.GW, main.GH)
+        assert baked_frame(world) == per_tile_frame(world, main.background())
+        # without one it is transparent between the tiles
+        bare = main.World(data)
+        assert bare.layer.get_flags() & pygame.SRCALPHA
+        assert baked_frame(bare, main.background()) == per_tile_frame(bare, main.background())
+
+        before = pygame.image.tobytes(world.layer, 'RGB')
+        world.rebuild_layer()
+        assert pygame.image.tobytes(world.layer, 'RGB') == before
+
+
+def test_world_without_backdrop_still_gets_the_sky():
+    game = main.Game(level=1, main_menu=False, dirty_rects=False)
+    state = game.state
+    for group in (state.blob_group, state.platform_group, state.lava_group,
+                  state.coin_group, state.exit_group):
+        group.empty()
+    data = [[0] * 20 for _ in range(19)] + [[1] * 20]
+    state.world = main.World(data, state=state)
+    assert not state.world.background
+    game.step()
+
+    expected = pygame.Surface((main.GW, main.GH), 0, main.game_surface)
+    for img, pos in main.background():
+        expected.blit(img, pos)
+    expected.blit(state.world.layer, (0, 0))
+    # away from the HUD and the player
+    area = pygame.Rect(200, 100, 800, 600)
+    got = main.game_surface.subsurface(area)
+    assert pygame.image.tobytes(got, 'RGB') == pygame.image.tobytes(expected.subsurface(area), 'RGB')
@@ -0,0 +1,42 @@
+import os
+
+import utils
+
+
+def test_shipped_binary_levels_match_json():
+    for level in range(1, 12):
+        grid = utils.load_level(level)
+        assert isinstance(grid, utils.LevelGrid)
+        assert grid.to_lists() == utils.load_level_data(level)
+        assert grid[3][5] == utils.load_level_data(level)[3][5]
+
+
+def test_binary_round_trip(tmp_path):
+    rows = [[0, 1, 2], [8, 7, 6]]
+    path = os.path.join(tmp_path, 'level99.lvl')
+    utils.save_level_binary(path, rows)
+    grid = utils.load_level_binary(path)
+    assert (grid.width, grid.height) == (3, 2)
+    assert [list(row) for row in grid] == rows
+    assert grid[-1][0] == 8
+    assert len(grid.to_bytes()) == 8 + 6
+
+
+def test_level_cache_lru_and_prefetch():
+    loads = []
+
+    def loader(level):
+        loads.append(level)
+        return utils.LevelGrid.from_rows([[level]])
+
+    cache = utils.LevelCache(maxsize=2, loader=loader, builder=lambda grid: grid[0][0] * 10)
+    assert cache.get(1)[1] == 10
+    assert cache.get(1)[1] == 10
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.prefetch(2)
+    assert cache.get(2)[1] == 20  # waits for the worker if it is still running
+    cache.get(3)                  # evicts level 1, the least recently used
+    assert 1 not in cache and 2 in cache and 3 in cache
+    assert loads == [1, 2, 3]
+    assert cache.get(99)[0].height == 1
@@ -0,0 +1,56 @@
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import main  # noqa: E402
+import env  # noqa: E402
+
+
+def snapshot(state):
+    state.world.sync_patrols()
+    patrols = [(s.rect.topleft, s.prev_pos, s.move_direction, s.move_counter)
+               for s in list(state.blob_group) + list(state.platform_group)]
+    return patrols, state.player.rect.topleft, state.score, state.game_over
+
+
+def random_keys(seed, count):
+    rnd = random.Random(seed)
+    return [main.make_keys(right=rnd.random() < 0.7, left=rnd.random() < 0.1, jump=rnd.random() < 0.3)
+            for _ in range(count)]
+
+
+@pytest.mark.parametrize('level', [1, 3, 4, 7, 10])
+def test_numpy_patrols_match_per_sprite_updates(level):
+    plain = main.GameState(level, headless=True, numpy_patrols=False)
+    arrays = main.GameState(level, headless=True, numpy_patrols=True)
+    assert not plain.world.vectorized and arrays.world.vectorized
+    for tick, keys in enumerate(random_keys(level, 600)):
+        plain.tick(keys)
+        arrays.tick(keys)
+        if tick % 50 == 0 or plain.game_over:
+            assert snapshot(arrays) == snapshot(plain)
+        if plain.game_over:
+            plain.restart_level()
+            arrays.restart_level()
+            assert snapshot(arrays) == snapshot(plain)
+    assert snapshot(arrays) == snapshot(plain)
+
+
+def test_numpy_patrols_in_env():
+    plain = env.Env(numpy_patrols=False)
+    arrays = env.Env(numpy_patrols=True)
+    plain.reset(6)
+    arrays.reset(6)
+    rnd = random.Random(0)
+    for _ in range(300):
+        action = rnd.choice([env.RIGHT, env.RIGHT | env.JUMP, 0])
+        obs, reward, done = plain.step(action)
+        obs2, reward2, done2 = arrays.step(action)
+        assert (obs['entities'] == obs2['entities']).all()
+        assert (obs['player'] == obs2['player']).all()
+        assert (reward, done) == (reward2, done2)
+        if done:
+            plain.reset(6)
+            arrays.reset(6)
@@ -0,0 +1,50 @@
+import asyncio
+
+import pygame
+import main
+import utils
+
+pygame.init()
+
+
+def test_loader_runs_manifest_in_order_and_records_failures():
+    order = []
+
+    def fail():
+        raise OSError('missing')
+
+    manifest = [('level', 'a', lambda: order.append('a') or 1),
+                ('level', 'bad', fail),
+                ('rest', 'b', lambda: order.append('b') or 2)]
+    loader = utils.AssetLoader(manifest)
+    assert loader.progress('level') == 0.0
+    # no worker: run_pending does the work, here all of it within the budget
+    assert loader.run_pending(budget=10)
+    assert order == ['a', 'b']
+    assert loader.loaded == {'a': 1, 'b': 2}
+    assert isinstance(loader.failed['bad'], OSError)
+    assert loader.ready('level') and loader.ready()
+    assert not loader.run_pending()
+
+    threaded = utils.AssetLoader(manifest)
+    assert threaded.start()
+    threaded.wait()
+    assert threaded.ready() and not threaded.run_pending()
+
+
+def test_preloaded_game_builds_level_after_loading():
+    utils.evict_images()
+    game = main.Game(level=3, main_menu=False, preload=True)
+    # nothing decoded before the progress screen: no state, player or buttons yet
+    assert game.state is None and not hasattr(game, 'restart_button')
+    assert utils.image_cache_info()['entries'] == 0
+    assert asyncio.run(game._preload())
+    assert game.loader.ready('level')
+    assert game.state.world is not None and game.state.level == 3
+    assert game.state.player.images_right is main.Player.load_frames()[0]
+    assert game.restart_button.image is game.loader.loaded['buttons'][0]
+    assert 3 in main.level_cache
+    game.loader.wait()
+    assert game.loader.ready() and not game.loader.failed
+    assert game.loader.loaded['coin'] is main.Coin.image
+    game.step()
@@ -0,0 +1,59 @@
+import pygame
+import pytest
+
+import main
+
+pygame.init()
+
+
+@pytest.fixture
+def window():
+    """Stand a plain surface of the given size in for the display, restoring it afterwards."""
+    main.init()
+    screen, mode = main.screen, main.present_mode
+
+    def resize(size, mode):
+        main.screen = pygame.Surface(size)
+        main.set_present_mode(mode)
+        return main.screen
+
+    yield resize
+    main.screen = screen
+    main.set_present_mode(mode)
+
+
+@pytest.mark.parametrize('size, mode, rect, scale', [
+    ((1280, 720), 'smooth', (0, 0, 1280, 720), (1.28, 0.72)),
+    ((1280, 720), 'nearest', (0, 0, 1280, 720), (1.28, 0.72)),
+    # too small for 1:1: divided by 2 and centred
+    ((1280, 720), 'integer', (390, 110, 500, 500), (0.5, 0.5)),
+    # room for 2x but not 3x
+    ((2100, 2050), 'integer', (50, 25, 2000, 2000), (2.0, 2.0)),
+    ((1000, 1000), 'integer', (0, 0, 1000, 1000), (1.0, 1.0)),
+])
+def test_present_rect_and_scale(window, size, mode, rect, scale):
+    window(size, mode)
+    assert main.present_rect == pygame.Rect(rect)
+    assert (main.scale_x, main.scale_y) == pytest.approx(scale)
+    assert main.screen_to_game_pos(main.present_rect.center) == (main.GW // 2, main.GH // 2)
+    assert main.screen_to_game_pos(main.present_rect.topleft) == (0, 0)
+
+
+@pytest.mark.parametrize('mode', ['smooth', 'nearest', 'integer'])
+def test_present_reuses_its_buffer(window, mode):
+    screen = window((2100, 2050), mode)
+    main.game_surface.fill((200, 40, 10))
+    main.present()
+    buffer = main._present_buffer
+    assert buffer is not None and buffer.get_size() == main.present_rect.size
+    main.update_scaling()
+    main.present()
+    assert main._present_buffer is buffer
+    assert screen.get_at(main.present_rect.center)[:3] == (200, 40, 10)
+    if mode == 'integer':
+        assert screen.get_at((0, 0))[:3] == (0, 0, 0)  # letterbox bar
+
+    window((1280, 720), mode)
+    main.present()
+    assert main._present_buffer is not buffer
+    assert main._present_buffer.get_size() == main.present_rect.size
@@ -0,0 +1,42 @@
+import pygame
+import main
+import profiler
+
+pygame.init()
+
+
+def test_percentiles_over_ring_window():
+    prof = profiler.FrameProfiler(size=100)
+    for ms in range(1, 201):
+        prof.current['tick'] = ms * 1_000_000
+        prof.end_frame()
+    # only the last 100 frames (101..200 ms) are kept
+    stats = prof.stats()['tick']
+    assert stats['p50'] == 150.0
+    assert stats['p95'] == 195.0
+    assert stats['p99'] == 199.0
+    assert stats['mean'] == 150.5
+
+
+def test_phase_missing_from_a_frame_counts_as_zero():
+    prof = profiler.FrameProfiler(size=4)
+    prof.current.update(a=2_000_000, b=1_000_000)
+    prof.end_frame()
+    prof.current['a'] = 2_000_000
+    prof.end_frame()
+    assert sorted(prof.samples('b')) == [0, 1_000_000]
+    assert prof.stats()['frame']['mean'] == 2.5
+
+
+def test_game_reports_frame_phases():
+    game = main.Game(level=2, main_menu=False, profile=True)
+    for _ in range(10):
+        game.step(1)
+    stats = game.profile_stats()
+    assert {'wait', 'input', 'patrols', 'coins', 'player', 'draw', 'present', 'flip', 'frame'} <= set(stats)
+    assert game.profiler.frames == 10
+    assert stats['frame']['p99'] >= stats['draw']['p99'] > 0
+
+    game.set_profiling(False)
+    game.step(1)
+    assert game.profile_stats() == {} and game.state.profiler is None
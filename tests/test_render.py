@@ -0,0 +1,48 @@
+import pygame
+import main
+
+pygame.init()
+
+
+def play(level, dirty_rects, frames=90):
+    game = main.Game(dirty_rects=dirty_rects, level=level, main_menu=False)
+    state = game.state
+    for frame in range(frames):
+        if frame == 20:
+            coins = [coin for coin in state.coin_group if coin.rect.y > main.tile_size]
+            if coins:
+                state.player.rect.midbottom = coins[0].rect.midtop
+        if frame == 50 and state.lava_group:
+            state.player.rect.midbottom = next(iter(state.lava_group)).rect.midtop
+        game.step()
+    return pygame.image.tobytes(main.game_surface, 'RGB'), state.score, state.game_over
+
+
+def test_dirty_rects_match_full_redraw():
+    # levels with enemies, both platform kinds, coins and lava
+    for level in (2, 4, 8):
+        assert play(level, dirty_rects=True) == play(level, dirty_rects=False)
+    assert pygame.image.tobytes(main.screen, 'RGB') == pygame.image.tobytes(main.game_surface, 'RGB')
+
+
+def test_dirty_rects_on_a_letterboxed_screen():
+    # integer scaling on 1920x1080 presents game_surface 1:1 at (460, 40)
+    main.init()
+    screen, mode, present = main.screen, main.present_mode, main.present
+    main.screen = pygame.Surface((1920, 1080))
+    main.set_present_mode('integer')
+    try:
+        assert main.present_rect == pygame.Rect(460, 40, 1000, 1000)
+        game = main.Game(dirty_rects=True, level=4, main_menu=False)
+        assert game._use_dirty_rects()
+        full_frames = []
+        main.present = lambda: full_frames.append(game.frame) or present()
+        for _ in range(60):
+            game.step()
+        assert len(full_frames) == 1  # after the first, every frame goes through the dirty path
+        shown = main.screen.subsurface(main.present_rect)
+        assert pygame.image.tobytes(shown, 'RGB') == pygame.image.tobytes(main.game_surface, 'RGB')
+        assert main.screen.get_at((0, 0))[:3] == (0, 0, 0)  # the bars stay clear
+    finally:
+        main.screen, main.present = screen, present
+        main.set_present_mode(mode)
@@ -0,0 +1,78 @@
+import struct
+
+import pygame
+import pytest
+import main
+import utils
+
+pygame.init()
+
+SCRIPT = """
+40 d
+12 d space
+30 d
+20 a
+25 d space
+"""
+
+
+def record(level, ticks):
+    """Play a looping script on a headless state, pressing restart after every death."""
+    state = main.GameState(level, headless=True)
+    replay = main.Replay(level)
+    inputs = main.ScriptedInput.parse(SCRIPT, loop=True)
+    trace = []
+    deaths = 0
+    for _ in range(ticks):
+        mask = main.key_mask(inputs.next())
+        if state.game_over == -1:
+            deaths += 1
+            replay.restart_pending = True
+            mask |= main.KEY_RESTART
+        replay.record(main.MASK_KEYS[mask & 7])
+        state.apply(mask)
+        trace.append((state.player.rect.topleft, state.score, state.game_over, state.level))
+    return replay, state, trace, deaths
+
+
+def test_replay_file_round_trip(tmp_path):
+    replay, state, trace, deaths = record(3, 1500)
+    assert deaths > 0
+    path = str(tmp_path / 'run.crp')
+    replay.save(path, state)
+
+    loaded = main.Replay.load(path)
+    assert loaded.level == 3 and loaded.runs == replay.runs
+    assert loaded.result == {'level': state.level, 'score': state.score, 'game_over': state.game_over}
+    assert len(loaded.runs) < 200  # run-length encoded, not one entry per tick
+
+    # same level + same input stream -> same run, tick for tick
+    replayed = main.GameState(3, headless=True)
+    for mask, expected in zip(loaded.masks(), trace):
+        replayed.apply(mask)
+        assert (replayed.player.rect.topleft, replayed.score, replayed.game_over, replayed.level) == expected
+    assert loaded.play().player.rect.topleft == state.player.rect.topleft
+
+
+def test_replay_levels_beyond_a_byte(tmp_path):
+    path = str(tmp_path / 'big.crp')
+    info = {'level': 1120, 'end_level': 1120, 'end_game_over': -1, 'end_score': 7}
+    utils.save_replay(path, info, [[90, 4], [10, 5]])
+    assert utils.load_replay(path) == (info, [[90, 4], [10, 5]])
+    with pytest.raises(ValueError):
+        utils.save_replay(path, dict(info, level=70000), [[1, 0]])
+
+    # version 1 files (u8 levels) still load
+    old = str(tmp_path / 'old.crp')
+    with open(old, 'wb') as f:
+        f.write(struct.pack('<4sBBBbHI', utils.REPLAY_MAGIC, 1, 3, 4, 1, 12, 100) + struct.pack('<HB', 100, 4))
+    assert utils.load_replay(old) == ({'level': 3, 'end_level': 4, 'end_game_over': 1, 'end_score': 12}, [[100, 4]])
+
+
+def test_real_time_playback_matches_fast_forward():
+    replay, state, _, _ = record(4, 600)
+    game = main.Game(replay=replay, dirty_rects=True)
+    for _ in range(replay.ticks // 2):
+        game.step(ticks=2)
+    assert game.state.player.rect.topleft == state.player.rect.topleft
+    assert (game.state.score, game.state.game_over, game.state.level) == (state.score, state.game_over, state.level)
@@ -0,0 +1,30 @@
+import pygame
+import main
+
+pygame.init()
+
+
+def snapshot(state):
+    patrols = sorted((s.rect.topleft, s.move_direction, s.move_counter)
+                     for s in list(state.blob_group) + list(state.platform_group))
+    coins = sorted(coin.rect.topleft for coin in state.coin_group)
+    return patrols, coins, state.player.rect.topleft, state.score, state.game_over
+
+
+def test_restart_restores_built_level():
+    game = main.Game(headless=True, level=4)
+    state = game.state
+    fresh = snapshot(state)
+    world = state.world
+
+    coin = next(c for c in state.coin_group if c.rect.y > main.tile_size)
+    state.player.rect.midbottom = coin.rect.midtop
+    for _ in range(120):
+        game.tick(main.make_keys(right=True))
+    assert snapshot(state) != fresh
+
+    state.restart_level()
+    assert state.world is world
+    assert snapshot(state) == fresh
+    # collected coins are back in the broad phase too
+    assert len(world.coin_hash) == len(fresh[1])
@@ -0,0 +1,44 @@
+import pygame
+import main
+from benchmarks import suite
+
+pygame.init()
+
+
+def test_big_level_scrolls_with_chunks_near_the_camera():
+    with suite.synthetic_levels((120,)) as numbers:
+        game = main.Game(level=numbers[120], main_menu=False)
+    world = game.state.world
+    player = game.state.player
+    assert world.chunks is not None and world.layer is None
+    assert world.size == (120 * main.tile_size, 120 * main.tile_size)
+
+    game.step()
+    chunks = world.chunks
+    side = chunks.size
+    # the 1000px view spans at most two 800px chunks a side
+    assert game.camera.left == 0  # clamped to the level
+    assert game.camera.centery == player.rect.centery
+    assert 1 <= len(chunks.surfaces) <= 4
+
+    player.rect.topleft = (3000, 3000)
+    player.prev_pos = player.rect.topleft
+    game.step(0)
+    assert game.camera.center == player.rect.center
+    assert set(chunks.surfaces) <= {(cx, cy) for cx in range(2, 6) for cy in range(2, 6)}
+    assert (0, 0) not in chunks.surfaces
+    # a dirt tile under the camera shows up where the camera puts it
+    row, col = next((r, c) for r in range(60, 80) for c in range(60, 80) if world.tile_grid[r][c]
+                    and game.camera.contains(world.tile_grid[r][c]))
+    tile = world.tile_grid[row][col]
+    x, y = tile.x - game.camera.x, tile.y - game.camera.y
+    chunk = chunks.surfaces[tile.x // side, tile.y // side]
+    assert main.game_surface.get_at((x + 10, y + 40)) == chunk.get_at((tile.x % side + 10, tile.y % side + 40))
+
+
+def test_level_that_fits_does_not_scroll():
+    game = main.Game(level=3, main_menu=False)
+    game.state.player.rect.x = 900
+    game.step()
+    assert game.state.world.chunks is None
+    assert game.camera.topleft == (0, 0)
@@ -0,0 +1,48 @@
+import random
+
+import pygame
+from spatial import SpatialHash
+
+
+class Box(pygame.sprite.Sprite):
+    def __init__(self, x, y, w, h):
+        super().__init__()
+        self.rect = pygame.Rect(x, y, w, h)
+
+
+def brute(boxes, rect):
+    return [box for box in boxes if box.rect.colliderect(rect)]
+
+
+def test_queries_match_brute_force():
+    rnd = random.Random(1)
+    boxes = [Box(rnd.randint(-200, 1200), rnd.randint(-200, 1200), rnd.randint(1, 120), rnd.randint(1, 120))
+             for _ in range(300)]
+    grid = SpatialHash(100, boxes)
+    for _ in range(200):
+        rect = pygame.Rect(rnd.randint(-300, 1300), rnd.randint(-300, 1300), rnd.randint(1, 200), rnd.randint(1, 200))
+        assert grid.collide(rect) == brute(boxes, rect)
+
+    # moving sprites are found at their new cells after refresh()
+    for box in boxes[:100]:
+        box.rect.move_ip(rnd.randint(-250, 250), rnd.randint(-250, 250))
+    grid.refresh()
+    for box in boxes[100:150]:
+        grid.remove(box)
+    remaining = boxes[:100] + boxes[150:]
+    assert len(grid) == len(remaining)
+    for _ in range(200):
+        rect = pygame.Rect(rnd.randint(-300, 1300), rnd.randint(-300, 1300), rnd.randint(1, 200), rnd.randint(1, 200))
+        assert grid.collide(rect) == brute(remaining, rect)
+
+
+def test_slack_widens_queries_until_refiled():
+    boxes = [Box(x * 30, 0, 20, 20) for x in range(40)]
+    grid = SpatialHash(100, boxes)
+    target = pygame.Rect(0, 40, 1200, 20)
+    for _ in range(45):
+        for box in boxes:
+            box.rect.y += 1
+        grid.moved(1)
+        assert grid.collide(target) == brute(boxes, target)
+    assert grid.slack < 50
@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHECK = """
+import pygame, utils, main
+assert not pygame.display.get_init()
+assert not pygame.mixer.get_init()
+assert main.screen is None and main.game_surface is None
+assert utils.image_cache_info()['entries'] == 0
+"""
+
+
+def test_import_has_no_side_effects():
+    # fresh interpreter: other tests have already set up pygame in this one
+    subprocess.run([sys.executable, '-c', CHECK], cwd=ROOT, check=True)
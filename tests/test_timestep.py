@@ -0,0 +1,44 @@
+import pytest
+
+import main
+
+
+def run_frames(hz, seconds, alpha=0.0):
+    """Ticks run in each simulated second at a steady `hz` render rate."""
+    per_second = []
+    for _ in range(seconds):
+        total = 0
+        for _ in range(hz):
+            ticks, alpha = main.frame_ticks(alpha, 1.0 / hz)
+            assert 0.0 <= alpha < 1.0
+            total += ticks
+        per_second.append(total)
+    return per_second, alpha
+
+
+@pytest.mark.parametrize('hz', [30, 60, 144])
+def test_sixty_ticks_per_second_at_any_render_rate(hz):
+    per_second, alpha = run_frames(hz, 10)
+    # float rounding may carry a tick across a second boundary, never lose one
+    assert all(abs(ticks - main.SIM_HZ) <= 1 for ticks in per_second)
+    assert sum(per_second) + alpha == pytest.approx(10 * main.SIM_HZ)
+
+
+def test_ticks_per_frame_at_steady_rates():
+    assert main.frame_ticks(0.0, 1 / 30)[0] == 2
+    assert main.frame_ticks(0.0, 1 / 60)[0] == 1
+    ticks, alpha = main.frame_ticks(0.0, 1 / 144)
+    assert ticks == 0 and alpha == pytest.approx(60 / 144)
+
+
+def test_catch_up_is_capped_per_frame():
+    # 0.2 s behind: 12 ticks due, MAX_TICKS_PER_FRAME run, the rest dropped
+    ticks, alpha = main.frame_ticks(0.0, 0.2)
+    assert ticks == main.MAX_TICKS_PER_FRAME
+    assert 0.0 <= alpha < 1.0
+    assert alpha == pytest.approx(0.2 * main.SIM_HZ % 1)
+
+
+def test_long_stalls_count_as_max_frame_time():
+    assert main.frame_ticks(0.5, 10.0) == main.frame_ticks(0.5, main.MAX_FRAME_TIME)
+    assert main.frame_ticks(0.0, 10.0)[0] == main.MAX_TICKS_PER_FRAME
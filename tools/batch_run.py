@@ -0,0 +1,77 @@
+"""
+Play many headless episodes across all cores and summarise the outcomes.
+Each level is played against every input script given and every seed
+(a seed stands for a random, right-biased script; see batch.random_script).
+Usage:
+    python tools/batch_run.py [--levels 1-11] [--scripts FILE_OR_DIR ...] [--seeds N]
+                              [--frames N] [--processes N] [--out results.jsonl]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import batch  # noqa: E402
+
+
+def parse_levels(text):
+    levels = []
+    for part in text.split(','):
+        first, _, last = part.partition('-')
+        levels.extend(range(int(first), int(last or first) + 1))
+    return levels
+
+
+def script_paths(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            yield from sorted(os.path.join(path, name) for name in os.listdir(path))
+        else:
+            yield path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--levels', type=parse_levels, default=parse_levels('1-11'))
+    parser.add_argument('--scripts', nargs='*', default=[])
+    parser.add_argument('--seeds', type=int, default=0, help='random scripts per level')
+    parser.add_argument('--frames', type=int, default=3600, help='tick limit per episode')
+    parser.add_argument('--processes', type=int, default=None, help='default: all cores')
+    parser.add_argument('--out', help='write one JSON result per line as they arrive')
+    args = parser.parse_args()
+
+    jobs = batch.make_jobs(args.levels, list(script_paths(args.scripts)), range(args.seeds), args.frames)
+    if not jobs:
+        parser.error('nothing to run: give --scripts and/or --seeds')
+    out = open(args.out, 'w', encoding='utf-8') if args.out else None
+    outcomes = Counter()
+    causes = Counter()
+    exits = Counter()
+    frames = 0
+    start = time.perf_counter()
+    for done, result in enumerate(batch.run_jobs(jobs, args.processes), 1):
+        outcomes[result['outcome']] += 1
+        if result['death_cause']:
+            causes[result['death_cause']] += 1
+        if result['outcome'] == 'exit':
+            exits[result['level']] += 1
+        frames += result['frames']
+        if out:
+            out.write(json.dumps(result) + '\n')
+        if done % 1000 == 0:
+            print(f'{done}/{len(jobs)} jobs', file=sys.stderr)
+    seconds = time.perf_counter() - start
+    if out:
+        out.close()
+
+    print(f'{len(jobs)} episodes, {frames} frames in {seconds:.1f}s '
+          f'({frames / seconds:.0f} frames/s, {len(jobs) / seconds:.0f} episodes/s)')
+    print('outcomes:', dict(outcomes), 'deaths:', dict(causes))
+    per_level = len(jobs) // len(args.levels)
+    for level in args.levels:
+        print(f'  level {level:>2}: {exits[level]}/{per_level} reached the exit')
@@ -0,0 +1,35 @@
+"""
+Compare frame times of the full-redraw and dirty-rectangle render paths.
+Runs headless (SDL dummy drivers) with the player idle on each level.
+Usage:
+    python tools/bench_dirty_rects.py [frames]
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+
+
+def time_frames(level, dirty_rects, frames):
+    game = main.Game(dirty_rects=dirty_rects, level=level, main_menu=False)
+    game.step()  # first frame is always a full redraw
+    start = time.perf_counter()
+    for _ in range(frames):
+        game.step()
+    return (time.perf_counter() - start) * 1000 / frames
+
+
+if __name__ == '__main__':
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    print(f'{"level":>5} {"full ms":>9} {"dirty ms":>9} {"speedup":>8}')
+    for level in range(1, main.max_levels + 1):
+        full = time_frames(level, False, frames)
+        dirty = time_frames(level, True, frames)
+        print(f'{level:>5} {full:>9.3f} {dirty:>9.3f} {full / dirty:>7.1f}x')
@@ -0,0 +1,45 @@
+"""
+Measure env.Env / env.BatchEnv steps per second (one core, nothing drawn).
+Actions are random, biased to the right; finished episodes are reset.
+Usage:
+    python tools/bench_env.py [steps] [batch size]
+"""
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import env  # noqa: E402
+
+CHOICES = [env.RIGHT, env.RIGHT | env.JUMP, env.RIGHT, env.LEFT, 0, env.JUMP]
+
+
+if __name__ == '__main__':
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    rnd = random.Random(0)
+    actions = [rnd.choice(CHOICES) for _ in range(steps)]
+
+    single = env.Env()
+    single.reset(1)
+    episodes = 0
+    start = time.perf_counter()
+    for i, action in enumerate(actions):
+        _, _, done = single.step(action)
+        if done:
+            episodes += 1
+            single.reset(i % 11 + 1)
+    seconds = time.perf_counter() - start
+    print(f'Env:        {steps / seconds:9.0f} steps/s ({episodes} episodes)')
+
+    batch = env.BatchEnv(n, [i % 11 + 1 for i in range(n)])
+    batch.reset()
+    rounds = steps // n
+    start = time.perf_counter()
+    for r in range(rounds):
+        batch.step(actions[r * n:(r + 1) * n])
+    seconds = time.perf_counter() - start
+    print(f'BatchEnv({n}): {rounds * n / seconds:9.0f} steps/s')
@@ -0,0 +1,70 @@
+"""
+Time loading a level from JSON, pickle and the binary .lvl format.
+Levels are generated into a temporary directory, from 20x20 up to 2000x2000.
+Every timing reads all the tiles: the .lvl one copies the mapped tile bytes
+out, as the JSON and pickle ones parse the whole file.
+Usage:
+    python tools/bench_level_formats.py [size ...]
+"""
+import json
+import os
+import pickle
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import utils  # noqa: E402
+
+SIZES = (20, 100, 500, 1000, 2000)
+
+
+def make_level(size, seed=0):
+    rnd = random.Random(seed)
+    return [[rnd.choice((0, 0, 0, 0, 1, 2, 3, 7)) for _ in range(size)] for _ in range(size)]
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_pickle(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    print(f'{"size":>10} {"json ms":>10} {"pickle ms":>10} {"lvl ms":>10} {"json KB":>9} {"lvl KB":>9}')
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            rows = make_level(size)
+            json_path = os.path.join(tmp, f'{size}.json')
+            pickle_path = os.path.join(tmp, f'{size}_data')
+            lvl_path = os.path.join(tmp, f'{size}.lvl')
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(rows, f)
+            with open(pickle_path, 'wb') as f:
+                pickle.dump(rows, f)
+            utils.save_level_binary(lvl_path, rows)
+            assert utils.load_level_binary(lvl_path).to_lists() == rows
+
+            repeat = 5 if size <= 500 else 2
+            json_ms = best_of(lambda: load_json(json_path), repeat)
+            pickle_ms = best_of(lambda: load_pickle(pickle_path), repeat)
+            lvl_ms = best_of(lambda: utils.load_level_binary(lvl_path).tiles.tobytes(), repeat)
+            print(f'{size:>4}x{size:<5} {json_ms:>10.3f} {pickle_ms:>10.3f} {lvl_ms:>10.3f} '
+                  f'{os.path.getsize(json_path) / 1024:>9.0f} {os.path.getsize(lvl_path) / 1024:>9.0f}')
@@ -0,0 +1,58 @@
+"""
+Time GameState.tick on a level packed with enemies, with the per-sprite
+patrol updates and with the NumPy backend (patrols.PatrolArrays). Reports the
+median ms of the patrol phase and of the whole tick, from the frame profiler.
+Usage:
+    python tools/bench_patrols.py [--enemies N] [--ticks N]
+"""
+import argparse
+import math
+import os
+import sys
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+import profiler  # noqa: E402
+
+CLEAR_COLS = 6  # left of the enemies, so the player spawns clear of them
+
+
+def enemy_level(enemies):
+    """Rows of `enemies` enemies right of the spawn point, above a dirt floor."""
+    side = math.isqrt(enemies - 1) + 1 if enemies else 1
+    rows = [[0] * CLEAR_COLS + [3] * side for _ in range(side)]
+    rows.append([1] * (CLEAR_COLS + side))
+    for col in range(side * side - enemies):  # trim the top row to the exact count
+        rows[0][CLEAR_COLS + col] = 0
+    return rows
+
+
+def bench(grid, ticks, numpy_patrols):
+    """(patrols p50 ms, tick p50 ms) over `ticks` ticks standing still."""
+    state = main.GameState(None, headless=True, numpy_patrols=numpy_patrols)
+    state.world = main.World(grid, state=state)
+    prof = state.profiler = profiler.FrameProfiler(size=ticks)
+    for _ in range(ticks):
+        prof.mark()
+        state.tick(main.NO_KEYS)
+        prof.end_frame()
+    stats = prof.stats()
+    return stats['patrols']['p50'], stats['frame']['p50']
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--enemies', type=int, default=10000)
+    parser.add_argument('--ticks', type=int, default=200)
+    args = parser.parse_args()
+
+    grid = enemy_level(args.enemies)
+    print(f'{args.enemies} enemies, {args.ticks} ticks')
+    for name, numpy_patrols in (('per-sprite', False), ('numpy', True)):
+        patrols, tick = bench(grid, args.ticks, numpy_patrols)
+        print(f'{name:>10}: patrols {patrols:8.3f} ms  tick {tick:8.3f} ms')
@@ -0,0 +1,42 @@
+"""
+Measure Cartofia's startup cost, each sample in a fresh interpreter.
+Reports the time to import pygame, then `import main` on top of that, then
+Game() (display, audio, fonts, sounds, first level and its images).
+Runs with SDL dummy drivers so it works without a window or sound card.
+Usage:
+    python tools/bench_startup.py [runs]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, time
+t0 = time.perf_counter()
+import pygame
+t1 = time.perf_counter()
+import main
+t2 = time.perf_counter()
+main.Game()
+t3 = time.perf_counter()
+print(json.dumps([t1 - t0, t2 - t1, t3 - t2]))
+"""
+
+
+def sample():
+    env = dict(os.environ, SDL_VIDEODRIVER='dummy', SDL_AUDIODRIVER='dummy',
+               PYGAME_HIDE_SUPPORT_PROMPT='1')
+    out = subprocess.run([sys.executable, '-c', CHILD], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    samples = [sample() for _ in range(runs)]
+    for name, times in zip(('import pygame', 'import main', 'Game()'), zip(*samples)):
+        print(f'{name:>13}: {statistics.median(times) * 1000:8.1f} ms (median of {runs})')
@@ -0,0 +1,96 @@
+"""
+Pack the sprite images in img/ into one atlas image plus a JSON index, so the
+game decodes (and the web build fetches) one file instead of one per sprite.
+utils.load_image hands out subsurfaces of the atlas for every packed name.
+The backdrops (sky.png, sun.png) are large and drawn whole, so they stay separate.
+The packed names are listed under ignoreFiles in pygbag.ini, so the web build
+ships the atlas alone. Re-run after adding or editing a sprite.
+Usage:
+    python tools/build_atlas.py [--padding N]
+"""
+import argparse
+import configparser
+import json
+import math
+import os
+import sys
+import zlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pygame  # noqa: E402
+import utils  # noqa: E402
+
+SKIP = {'sky.png', 'sun.png', utils.ATLAS_IMAGE}
+WEB_CONFIG = os.path.join(ROOT, 'pygbag.ini')
+
+
+def sprite_names():
+    return sorted(name for name in os.listdir(utils.ASSET_DIR)
+                  if name.endswith('.png') and name not in SKIP)
+
+
+def pack(sizes, padding=1):
+    """Shelf-pack {name: (w, h)}; returns ({name: (x, y, w, h)}, (width, height))."""
+    area = sum((w + padding) * (h + padding) for w, h in sizes.values())
+    width = max([math.ceil(math.sqrt(area))] + [w + padding for w, _ in sizes.values()])
+    rects = {}
+    x = y = shelf = 0
+    # tallest first, so each shelf wastes little height
+    for name, (w, h) in sorted(sizes.items(), key=lambda item: (-item[1][1], item[0])):
+        if x + w > width:
+            x = 0
+            y += shelf + padding
+            shelf = 0
+        rects[name] = (x, y, w, h)
+        x += w + padding
+        shelf = max(shelf, h)
+    used = max(x + w for x, _, w, _ in rects.values()) if rects else 0
+    return rects, (used, y + shelf)
+
+
+def exclude_from_web(names, path=WEB_CONFIG):
+    """Set pygbag.ini's ignoreFiles to `names`, keeping its other settings."""
+    config = configparser.ConfigParser()
+    config.optionxform = str  # keep the keys' case
+    config.read(path, encoding='utf-8')
+    if not config.has_section('DEPENDENCIES'):
+        config.add_section('DEPENDENCIES')
+    section = config['DEPENDENCIES']
+    section.setdefault('ignoreDirs', '[]')
+    section['ignoreFiles'] = json.dumps(sorted(names))
+    with open(path, 'w', encoding='utf-8') as f:
+        config.write(f)
+
+
+def build(padding=1):
+    images = {}
+    sources = {}
+    for name in sprite_names():
+        path = os.path.join(utils.ASSET_DIR, name)
+        with open(path, 'rb') as f:
+            sources[name] = zlib.crc32(f.read())  # how utils spots a sprite edited since
+        images[name] = pygame.image.load(path)
+    rects, size = pack({name: img.get_size() for name, img in images.items()}, padding)
+    sheet = pygame.Surface(size, pygame.SRCALPHA)
+    for name, (x, y, _, _) in rects.items():
+        # adding onto the cleared sheet copies the pixels, alpha included, unblended
+        sheet.blit(images[name], (x, y), special_flags=pygame.BLEND_RGBA_ADD)
+    pygame.image.save(sheet, os.path.join(utils.ASSET_DIR, utils.ATLAS_IMAGE))
+    with open(os.path.join(utils.ASSET_DIR, utils.ATLAS_INDEX), 'w', encoding='utf-8') as f:
+        json.dump({'image': utils.ATLAS_IMAGE, 'sprites': rects, 'sources': sources}, f, sort_keys=True)
+        f.write('\n')
+    exclude_from_web(rects)
+    return rects, size
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--padding', type=int, default=1, help='transparent px between sprites')
+    args = parser.parse_args()
+    rects, size = build(args.padding)
+    packed = sum(os.path.getsize(os.path.join(utils.ASSET_DIR, name)) for name in rects)
+    atlas = os.path.getsize(os.path.join(utils.ASSET_DIR, utils.ATLAS_IMAGE))
+    print(f'{len(rects)} sprites -> {utils.ATLAS_IMAGE} {size[0]}x{size[1]} '
+          f'({atlas // 1024} KiB, was {packed // 1024} KiB in separate files)')
@@ -1,7 +1,11 @@
-import os, json, pickle
+import os, sys, json, pickle
 
-ROOT = os.path.dirname(os.path.dirname(__file__))
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
 
+import utils  # noqa: E402
+
+# levelN_data pickles -> levelN.json
 for fname in os.listdir(ROOT):
     if fname.startswith('level') and fname.endswith('_data'):
         levelname = fname.split('_')[0]  # level1, level2
@@ -15,3 +19,15 @@ for fname in os.listdir(ROOT):
             print(f'Converted {fname} -> {levelname}.json')
         except Exception as e:
             print('Failed to convert', fname, e)
+
+# levelN.json -> levelN.lvl (compact binary format, see utils.load_level_binary)
+for fname in sorted(os.listdir(ROOT)):
+    if fname.startswith('level') and fname.endswith('.json'):
+        levelname = fname[:-len('.json')]
+        try:
+            with open(os.path.join(ROOT, fname), 'r', encoding='utf-8') as jf:
+                data = json.load(jf)
+            utils.save_level_binary(os.path.join(ROOT, f'{levelname}.lvl'), data)
+            print(f'Converted {fname} -> {levelname}.lvl')
+        except Exception as e:
+            print('Failed to convert', fname, e)
@@ -0,0 +1,33 @@
+"""
+Run Cartofia headless (no window, audio or frame cap) and report simulated fps.
+Usage:
+    python tools/headless_run.py [--level N] [--frames N] [--script FILE] [--loop]
+A script holds one `<ticks> [space] [a] [d]` step per line (see main.ScriptedInput).
+Exits non-zero if the player died, so it can gate CI playthroughs.
+"""
+import argparse
+import os
+import sys
+
+os.environ['CARTOFIA_HEADLESS'] = '1'
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--level', type=int, default=1)
+    parser.add_argument('--frames', type=int, default=3600)
+    parser.add_argument('--script', help='input script; the player idles without one')
+    parser.add_argument('--loop', action='store_true', help='restart the script when it runs out')
+    args = parser.parse_args()
+
+    game = main.Game(level=args.level)
+    inputs = main.ScriptedInput.load(args.script, loop=args.loop) if args.script else None
+    result = game.simulate(args.frames, inputs)
+    print('{frames} frames in {seconds:.3f}s = {fps:.0f} simulated fps; '
+          'level {level}, score {score}, game_over {game_over}'.format(**result))
+    sys.exit(1 if result['game_over'] == -1 else 0)
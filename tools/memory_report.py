@@ -0,0 +1,63 @@
+"""
+Report how much Python memory each level's World takes: its sprites, their
+rects, the groups and the spatial hashes, as counted by tracemalloc. Image
+pixels are shared between sprites and tile layers are not built (headless),
+so neither is counted. A stress level with thousands of coins is measured too.
+Usage:
+    python tools/memory_report.py [--coins N]
+"""
+import argparse
+import gc
+import math
+import os
+import sys
+import tracemalloc
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+import utils  # noqa: E402
+
+
+def coin_level(coins):
+    """A square level filled with `coins` coins above a dirt floor."""
+    side = math.isqrt(coins - 1) + 1 if coins else 1
+    rows = [[7] * side for _ in range(side)]
+    rows.append([1] * side)
+    extra = side * side - coins
+    for col in range(extra):  # trim the last row of coins to the exact count
+        rows[side - 1][col] = 0
+    return rows
+
+
+def world_bytes(grid):
+    """(entities, bytes) for building a headless World of `grid`."""
+    main.GameState(None, headless=True)  # images decoded and cached outside the measurement
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    state = main.GameState(None, headless=True)
+    state.world = main.World(grid, state=state)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    entities = sum(len(group) for group in (state.blob_group, state.platform_group, state.lava_group,
+                                            state.coin_group, state.exit_group))
+    return entities, used
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--coins', type=int, default=5000, help='coins in the stress level')
+    args = parser.parse_args()
+
+    print(f'{"level":>12} {"entities":>9} {"KiB":>9} {"bytes/entity":>13}')
+    levels = [(f'level{n}', utils.load_level(n)) for n in range(1, main.max_levels + 1)]
+    levels.append((f'{args.coins} coins', coin_level(args.coins)))
+    for name, grid in levels:
+        entities, used = world_bytes(grid)
+        print(f'{name:>12} {entities:>9} {used / 1024:>9.1f} {used / max(entities, 1):>13.0f}')
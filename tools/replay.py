@@ -0,0 +1,42 @@
+"""
+Re-run recorded replays (.crp, see main.Replay) and check they still end the
+way they did when recorded. Record one by playing with CARTOFIA_RECORD=run.crp.
+Usage:
+    python tools/replay.py FILE [FILE ...]     fast-forward, headless, nothing drawn
+    python tools/replay.py --watch FILE        play back at real time in a window
+Exits non-zero if any replay now ends differently (e.g. after a physics change).
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--watch', action='store_true', help='render at real time instead')
+    args = parser.parse_args()
+
+    if args.watch:
+        asyncio.run(main.Game(replay=args.files[0]).run())
+        sys.exit(0)
+
+    failed = 0
+    for path in args.files:
+        replay = main.Replay.load(path)
+        start = time.perf_counter()
+        state = replay.play()
+        seconds = time.perf_counter() - start
+        got = {'level': state.level, 'score': state.score, 'game_over': state.game_over}
+        ok = got == replay.result
+        failed += not ok
+        print(f'{"ok  " if ok else "FAIL"} {path}: level {replay.level}, {replay.ticks} ticks '
+              f'in {seconds * 1000:.0f} ms -> {got}' + ('' if ok else f', recorded {replay.result}'))
+    sys.exit(1 if failed else 0)
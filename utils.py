@@ -1,7 +1,17 @@
 import os
 import json
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
 import pygame
 
+try:
+    import mmap
+except ImportError:  # not available on every web runtime
+    mmap = None
+
 ROOT_DIR = os.path.dirname(__file__)
 ASSET_DIR = os.path.join(ROOT_DIR, 'img')
 LEVELS_DIR = ROOT_DIR
@@ -11,10 +21,81 @@ def _full_path_in_assets(name):
     return os.path.join(ASSET_DIR, name)
 
 
+# Sprite atlas (tools/build_atlas.py): one image holding every sprite plus an
+# index of where each one is; load_image hands out subsurfaces of it. The
+# source PNGs stay in img/ for the desktop game and tools, but are left out of
+# the web build (pygbag.ini).
+ATLAS_IMAGE = 'atlas.png'
+ATLAS_INDEX = 'atlas.json'
+# {'sheet': Surface, 'sprites': {name: rect}, 'sources': {name: crc32},
+#  'mtime': index mtime, 'converted': bool}; {} if none
+_atlas = None
+# Guards filling _atlas and _image_cache: the level prefetch and asset loader
+# threads decode images too. Reentrant, as get_image calls itself for scaled
+# variants and load_image goes through atlas_image.
+_image_lock = threading.RLock()
+
+
+def _load_atlas():
+    path = _full_path_in_assets(ATLAS_INDEX)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        sheet = pygame.image.load(_full_path_in_assets(index['image']))
+    except Exception as e:
+        print(f"[utils] Sprite atlas {path} unusable, loading images one by one: {e}")
+        return {}
+    return {'sheet': sheet, 'sprites': index['sprites'], 'sources': index.get('sources', {}),
+            'mtime': os.path.getmtime(path), 'converted': False}
+
+
+def _atlas_stale(name):
+    """True if img/`name` was edited after the atlas was built: newer than the
+    index, with contents that differ from the ones packed."""
+    path = _full_path_in_assets(name)
+    try:
+        if os.path.getmtime(path) <= _atlas['mtime']:
+            return False
+        with open(path, 'rb') as f:
+            return zlib.crc32(f.read()) != _atlas['sources'].get(name)
+    except OSError:
+        return False  # no separate file (the web build): the atlas is all there is
+
+
+def atlas_image(name):
+    """`name` as a subsurface of the sprite atlas, or None if it isn't packed
+    (or its file has changed since the atlas was built)."""
+    global _atlas
+    with _image_lock:
+        if _atlas is None:
+            _atlas = _load_atlas()
+        if not _atlas or name not in _atlas['sprites']:
+            return None
+        if _atlas_stale(name):
+            print(f"[utils] {name} changed since the atlas was built, loading the file; "
+                  f"re-run tools/build_atlas.py")
+            return None
+        if not _atlas['converted'] and pygame.display.get_surface() is not None:
+            # convert once, for fast blits; earlier subsurfaces keep the raw sheet
+            _atlas['sheet'] = _atlas['sheet'].convert_alpha()
+            _atlas['converted'] = True
+        return _atlas['sheet'].subsurface(_atlas['sprites'][name])
+
+
 def load_image(name, alpha=True, fallback_size=(64, 64)):
+    img = atlas_image(name)
+    if img is not None:
+        if alpha or pygame.display.get_surface() is None:
+            return img
+        return img.convert()
     path = _full_path_in_assets(name)
     try:
         img = pygame.image.load(path)
+        if pygame.display.get_surface() is None:
+            # no display yet (tools, tests): convert needs a video mode
+            return img
         return img.convert_alpha() if alpha else img.convert()
     except Exception as e:
         # fallback placeholder
@@ -24,6 +105,64 @@ def load_image(name, alpha=True, fallback_size=(64, 64)):
         return surf
 
 
+# Process-wide registry of decoded images, keyed by (name, alpha, size).
+# size None is the surface as decoded; every scaled variant is stored once too.
+_image_cache = {}
+_image_cache_stats = {'hits': 0, 'misses': 0}
+# bumped by evict_images: code that holds on to a surface from get_image
+# (main.SharedImage) fetches it again when this changes
+image_generation = 0
+
+
+def get_image(name, alpha=True, size=None):
+    """Return a shared surface for `name`, decoding/scaling it only on first use.
+
+    The surface is shared by every caller, so never draw onto it. Safe to call
+    from several threads: each image is decoded once.
+    """
+    if size is not None:
+        size = (int(size[0]), int(size[1]))
+    key = (name, alpha, size)
+    img = _image_cache.get(key)
+    if img is None:
+        with _image_lock:
+            img = _image_cache.get(key)  # another thread may have just filled it
+            if img is None:
+                _image_cache_stats['misses'] += 1
+                if size is None:
+                    img = load_image(name, alpha=alpha)
+                else:
+                    img = pygame.transform.scale(get_image(name, alpha), size)
+                _image_cache[key] = img
+                return img
+    _image_cache_stats['hits'] += 1
+    return img
+
+
+def image_cache_info():
+    return {
+        'hits': _image_cache_stats['hits'],
+        'misses': _image_cache_stats['misses'],
+        'entries': len(_image_cache),
+    }
+
+
+def evict_images(name=None):
+    """Drop cached surfaces for `name` (all variants), or everything if None."""
+    global image_generation
+    with _image_lock:
+        image_generation += 1
+        if name is None:
+            count = len(_image_cache)
+            _image_cache.clear()
+            _image_cache_stats['hits'] = _image_cache_stats['misses'] = 0
+            return count
+        keys = [key for key in _image_cache if key[0] == name]
+        for key in keys:
+            del _image_cache[key]
+        return len(keys)
+
+
 def load_sound(name):
     path = _full_path_in_assets(name)
     try:
@@ -39,7 +178,18 @@ def load_sound(name):
             return None
 
 
+_font_cache = {}
+
+
 def default_font(size: int):
+    # Fonts are created once per size and shared
+    font = _font_cache.get(size)
+    if font is None:
+        font = _font_cache[size] = _make_font(size)
+    return font
+
+
+def _make_font(size):
     # Try to load a bundled font; fallback to default sys font if not available
     bundled = os.path.join(ASSET_DIR, 'font.ttf')
     try:
@@ -50,8 +200,27 @@ def default_font(size: int):
     return pygame.font.SysFont(None, size)
 
 
+# LRU of rendered text keyed by (font, text, color, antialias): HUD strings
+# that don't change between frames are rendered once and then only blitted.
+TEXT_CACHE_SIZE = 128
+_text_cache = OrderedDict()
+
+
+def render_text(font, text, color, antialias=True):
+    key = (font, text, tuple(color), antialias)
+    img = _text_cache.get(key)
+    if img is not None:
+        _text_cache.move_to_end(key)
+        return img
+    img = font.render(text, antialias, color)
+    _text_cache[key] = img
+    if len(_text_cache) > TEXT_CACHE_SIZE:
+        _text_cache.popitem(last=False)
+    return img
+
+
 def draw_text(surface: pygame.Surface, text: str, font: pygame.font.Font, color, x: int, y: int, center=False):
-    img = font.render(text, True, color)
+    img = render_text(font, text, color)
     if center:
         rect = img.get_rect(center=(x, y))
     else:
@@ -76,3 +245,306 @@ def load_level_data(level_num):
             print(f"[utils] Failed to load pickled level {pickle_path}: {e}")
     print(f"[utils] No level data found for level{level_num}")
     return None
+
+
+# --- Binary levels (levelN.lvl) ---
+# An 8-byte header (magic b'CLVL', then width and height as little-endian
+# uint16) followed by width * height tile bytes in row-major order.
+LEVEL_MAGIC = b'CLVL'
+_LEVEL_HEADER = struct.Struct('<4sHH')
+
+
+class LevelGrid:
+    """A level's tiles in one flat byte buffer, indexed like a list of rows.
+
+    grid[row] is a memoryview of that row, so `for row in grid: for tile in row`
+    and grid[row][col] work without building per-row lists.
+    """
+
+    def __init__(self, width, height, tiles, source=None):
+        if len(tiles) != width * height:
+            raise ValueError(f'expected {width * height} tiles, got {len(tiles)}')
+        self.width = width
+        self.height = height
+        self.tiles = memoryview(tiles)
+        self._source = source  # keeps a backing mmap alive
+
+    @classmethod
+    def from_rows(cls, rows):
+        height = len(rows)
+        width = max((len(row) for row in rows), default=0)
+        tiles = bytearray(width * height)
+        for y, row in enumerate(rows):
+            tiles[y * width:y * width + len(row)] = bytes(row)
+        return cls(width, height, tiles)
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += self.height
+        if not 0 <= row < self.height:
+            raise IndexError('level row out of range')
+        start = row * self.width
+        return self.tiles[start:start + self.width]
+
+    def __iter__(self):
+        for row in range(self.height):
+            yield self[row]
+
+    def to_lists(self):
+        return [list(row) for row in self]
+
+    def to_bytes(self):
+        return _LEVEL_HEADER.pack(LEVEL_MAGIC, self.width, self.height) + self.tiles.tobytes()
+
+
+def load_level_binary(path):
+    """Map a .lvl file and return a LevelGrid viewing its tiles in place."""
+    with open(path, 'rb') as f:
+        header = f.read(_LEVEL_HEADER.size)
+        if len(header) < _LEVEL_HEADER.size:
+            raise ValueError(f'{path}: truncated level header')
+        magic, width, height = _LEVEL_HEADER.unpack(header)
+        if magic != LEVEL_MAGIC:
+            raise ValueError(f'{path}: not a Cartofia level file')
+        if mmap is None or width * height == 0:
+            return LevelGrid(width, height, f.read(width * height))
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    end = _LEVEL_HEADER.size + width * height
+    return LevelGrid(width, height, memoryview(mapped)[_LEVEL_HEADER.size:end], source=mapped)
+
+
+def save_level_binary(path, rows):
+    """Write a level (LevelGrid or list of rows) as a .lvl file."""
+    grid = rows if isinstance(rows, LevelGrid) else LevelGrid.from_rows(rows)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(grid.to_bytes())
+    os.replace(tmp_path, path)
+
+
+def load_level(level_num):
+    """Level `level_num` as a LevelGrid: levelN.lvl if present, else JSON/pickle."""
+    lvl_path = os.path.join(LEVELS_DIR, f'level{level_num}.lvl')
+    if os.path.exists(lvl_path):
+        try:
+            return load_level_binary(lvl_path)
+        except (OSError, ValueError) as e:
+            print(f"[utils] Failed to load binary level {lvl_path}: {e}")
+    rows = load_level_data(level_num)
+    return LevelGrid.from_rows(rows) if rows else None
+
+
+class LevelCache:
+    """Bounded LRU of loaded levels, with background prefetch of upcoming ones.
+
+    Each entry holds the LevelGrid and whatever `builder(grid)` made from it
+    (the game pre-renders the static tile layer), so going back to a cached
+    level costs no disk I/O and no rebuild. prefetch() loads a level on a
+    worker thread; where threads can't be started (web) it is queued and done
+    by run_pending(), which the game loop calls between frames.
+    """
+
+    def __init__(self, maxsize=4, loader=None, builder=None):
+        self.maxsize = maxsize
+        self.loader = loader or load_level
+        self.builder = builder
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # level_num -> (grid, built)
+        self._lock = threading.Lock()
+        self._loading = {}             # level_num -> worker thread
+        self._queued = []              # prefetches waiting for run_pending()
+
+    def __contains__(self, level_num):
+        return level_num in self._entries
+
+    def _load(self, level_num):
+        grid = self.loader(level_num)
+        if grid is None:
+            return None
+        if isinstance(grid, LevelGrid) and grid._source is not None:
+            grid.tiles.tobytes()  # fault the mapped pages in now, not mid-frame
+        built = self.builder(grid) if self.builder else None
+        return grid, built
+
+    def _store(self, level_num, entry):
+        with self._lock:
+            self._entries[level_num] = entry
+            self._entries.move_to_end(level_num)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get(self, level_num):
+        """(grid, built) for `level_num`, loading it now if it isn't cached."""
+        worker = self._loading.get(level_num)
+        if worker is not None:
+            worker.join()
+        with self._lock:
+            entry = self._entries.get(level_num)
+            if entry is not None:
+                self._entries.move_to_end(level_num)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        entry = self._load(level_num)
+        if entry is None:
+            return None, None
+        self._store(level_num, entry)
+        return entry
+
+    def prefetch(self, level_num):
+        """Start loading `level_num` in the background unless it is cached or on its way."""
+        if level_num in self._entries or level_num in self._loading or level_num in self._queued:
+            return
+        worker = threading.Thread(target=self._prefetch, args=(level_num,), daemon=True)
+        self._loading[level_num] = worker
+        try:
+            worker.start()
+        except RuntimeError:  # no threads on this platform
+            del self._loading[level_num]
+            self._queued.append(level_num)
+
+    def _prefetch(self, level_num):
+        try:
+            entry = self._load(level_num)
+            if entry is not None:
+                self._store(level_num, entry)
+        except Exception as e:
+            print(f"[utils] Prefetch of level {level_num} failed: {e}")
+        finally:
+            self._loading.pop(level_num, None)
+
+    def run_pending(self):
+        """Do one queued prefetch (for platforms without threads); True if one ran."""
+        if not self._queued:
+            return False
+        self._prefetch(self._queued.pop(0))
+        return True
+
+    def evict(self, level_num=None):
+        with self._lock:
+            if level_num is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(level_num, None)
+
+
+class AssetLoader:
+    """Loads a manifest of assets in the background, in order.
+
+    The manifest is a list of (group, name, load) entries; load() decodes one
+    asset (through get_image, load_sound, a LevelCache...) so it is cached for
+    whoever needs it next. start() works through the list on a worker thread;
+    where threads can't be started (web), run_pending() does a few
+    milliseconds of it at a time from the game loop, like LevelCache.
+    """
+
+    def __init__(self, manifest):
+        self.manifest = list(manifest)
+        self.loaded = {}  # name -> what load() returned
+        self.failed = {}  # name -> the exception load() raised
+        self._next = 0
+        self._worker = None
+
+    def start(self):
+        worker = threading.Thread(target=self._run, daemon=True)
+        try:
+            worker.start()
+        except RuntimeError:  # no threads on this platform: run_pending() does the work
+            return False
+        self._worker = worker
+        return True
+
+    def _load_next(self):
+        group, name, load = self.manifest[self._next]
+        try:
+            self.loaded[name] = load()
+        except Exception as e:
+            self.failed[name] = e
+            print(f"[utils] Loading {group} asset {name} failed: {e}")
+        self._next += 1
+
+    def _run(self):
+        while self._next < len(self.manifest):
+            self._load_next()
+
+    def run_pending(self, budget=0.01):
+        """Without a worker thread, load entries for up to `budget` seconds; True if any ran."""
+        if self._worker is not None or self._next >= len(self.manifest):
+            return False
+        deadline = time.perf_counter() + budget
+        self._load_next()
+        while self._next < len(self.manifest) and time.perf_counter() < deadline:
+            self._load_next()
+        return True
+
+    def progress(self, group=None):
+        """Fraction of the entries (of `group`, or all) that are done, failed ones included."""
+        entries = [name for g, name, _ in self.manifest if group is None or g == group]
+        if not entries:
+            return 1.0
+        done = sum(1 for name in entries if name in self.loaded or name in self.failed)
+        return done / len(entries)
+
+    def ready(self, group=None):
+        return self.progress(group) >= 1.0
+
+    def wait(self):
+        """Finish loading everything now."""
+        if self._worker is not None:
+            self._worker.join()
+        else:
+            self._run()
+
+
+# Replay files (.crp): a recorded run's per-tick key masks, run-length encoded.
+# Header: magic, version, start level, end level, end game_over, end score,
+# tick count; then one (ticks, mask) pair per run of identical ticks.
+# Version 2 widened the levels from u8 to u16; version 1 files still load.
+REPLAY_MAGIC = b'CRPL'
+REPLAY_VERSION = 2
+_REPLAY_HEADERS = {1: struct.Struct('<4sBBBbHI'), 2: struct.Struct('<4sBHHbHI')}
+_REPLAY_HEADER = _REPLAY_HEADERS[REPLAY_VERSION]
+_REPLAY_RUN = struct.Struct('<HB')
+
+
+def save_replay(path, info, runs):
+    """Write `runs` ([ticks, mask] pairs) with `info` (level, end_level, end_game_over, end_score)."""
+    ticks = sum(count for count, _ in runs)
+    for key in ('level', 'end_level'):
+        if not 0 <= info[key] <= 0xFFFF:
+            raise ValueError(f"replay {key} {info[key]} does not fit the file's 0..65535")
+    parts = [_REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, info['level'], info['end_level'],
+                                 info['end_game_over'], min(info['end_score'], 0xFFFF), ticks)]
+    for count, mask in runs:
+        while count > 0:  # runs longer than a u16 are split
+            step = min(count, 0xFFFF)
+            parts.append(_REPLAY_RUN.pack(step, mask))
+            count -= step
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(b''.join(parts))
+    os.replace(tmp_path, path)
+
+
+def load_replay(path):
+    """(info, runs) from a replay file written by save_replay."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    header = _REPLAY_HEADERS.get(data[4]) if len(data) > 4 else None
+    if data[:4] != REPLAY_MAGIC or header is None:
+        raise ValueError(f'{path}: not a Cartofia replay file (versions {sorted(_REPLAY_HEADERS)})')
+    if len(data) < header.size:
+        raise ValueError(f'{path}: truncated replay header')
+    _, _, level, end_level, end_game_over, end_score, ticks = header.unpack_from(data)
+    body = data[header.size:]
+    if len(body) % _REPLAY_RUN.size:
+        raise ValueError(f'{path}: truncated replay')
+    runs = [list(run) for run in _REPLAY_RUN.iter_unpack(body)]
+    if sum(count for count, _ in runs) != ticks:
+        raise ValueError(f'{path}: replay holds {sum(count for count, _ in runs)} ticks, header says {ticks}')
+    info = {'level': level, 'end_level': end_level, 'end_game_over': end_game_over, 'end_score': end_score}
+    return info, runs